@@ -0,0 +1,38 @@
+import argparse
+import os
+from app import database
+from app.config import carregar_configuracoes
+from app.schema import inicializar_banco
+from app.models.estatisticas import reconstruir_estatisticas
+
+# Comandos administrativos: python -m app <comando>
+def rebuild_stats(args):
+    database.configurar_banco(carregar_configuracoes())
+    inicializar_banco(database.engine)
+    with database.engine.begin() as conn:
+        reconstruir_estatisticas(conn)
+    print("Estatísticas reconstruídas.")
+
+def serve(args):
+    from app.servidor import servir
+    servir(carregar_configuracoes(), args.host, args.port, args.workers, args.tempo_encerramento)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app", description="Gerenciador de livros")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comando = comandos.add_parser("rebuild-stats", help="recalcula do zero os contadores de /categorias/stats")
+    comando.set_defaults(func=rebuild_stats)
+
+    comando = comandos.add_parser("serve", help="inicia a API com vários processos (um worker por núcleo)")
+    comando.add_argument("--host", default="127.0.0.1")
+    comando.add_argument("--port", type=int, default=8000)
+    comando.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    comando.add_argument("--tempo-encerramento", type=int, default=30, help="segundos para concluir as requisições em andamento")
+    comando.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
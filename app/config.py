@@ -0,0 +1,84 @@
+import os
+import typing
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+# Configurações da aplicação. Cada campo pode ser definido pela variável de ambiente
+# de mesmo nome em maiúsculas (ex.: database_url -> DATABASE_URL) ou pelo arquivo .env.
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "sqlite:///./livros.db"
+    database_read_url: Optional[str] = None  # Réplica de leitura; se vazio, usa database_url
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800  # Segundos até reciclar uma conexão
+    db_pool_timeout: int = 30
+    db_pool_pre_ping: bool = False  # Testa a conexão a cada checkout (uma ida ao banco por requisição)
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+
+    secret_key: Optional[str] = None
+    access_token_expire_minutes: int = 30
+    cache_usuarios_ttl: float = 60  # Segundos
+    cache_usuarios_tamanho: int = 1024
+    cache_respostas_ttl: float = 30
+    cache_respostas_tamanho: int = 4096
+
+    bcrypt_rounds: int = 12
+    hash_workers: int = field(default_factory=lambda: max(1, (os.cpu_count() or 2) // 2))
+    hash_fila_maxima: Optional[int] = None  # Padrão: 4 por processo do pool
+
+    escrita_agrupada: bool = False  # Group commit das criações/atualizações de livros
+    escrita_janela_ms: float = 2.0
+    escrita_lote_maximo: int = 64
+
+    gzip_tamanho_minimo: int = 1024  # Bytes; respostas menores não são comprimidas (negativo desliga)
+    gzip_nivel: int = 6
+
+    # Intervalo da leitura do feed de alterações que atualiza os caches deste processo com as escritas
+    # dos demais (0 desliga; o comando serve liga com mais de um worker)
+    sincronizacao_intervalo_s: float = 0
+
+    log_nivel: str = "INFO"
+    log_fila_tamanho: int = 10000
+    log_taxa_amostragem: float = 1.0
+    log_requisicoes_lentas_ms: float = 0  # 0 desliga o log de requisições lentas
+
+def _converter(nome: str, tipo, valor: str):
+    if typing.get_origin(tipo) is typing.Union:
+        tipo = next(argumento for argumento in typing.get_args(tipo) if argumento is not type(None))
+    if tipo is bool:
+        if valor.lower() in ("1", "true", "sim", "on"):
+            return True
+        if valor.lower() in ("0", "false", "nao", "não", "off"):
+            return False
+        raise ValueError(f"Configuração inválida: {nome.upper()}={valor!r} (esperado bool)")
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f"Configuração inválida: {nome.upper()}={valor!r} (esperado {tipo.__name__})")
+
+# Lê as configurações do ambiente (carregando o .env); valores passados sobrescrevem o ambiente
+def carregar_configuracoes(**sobrescritas) -> Settings:
+    from dotenv import load_dotenv
+    load_dotenv()
+    valores = {}
+    for campo in fields(Settings):
+        bruto = os.getenv(campo.name.upper())
+        if bruto is not None and bruto.strip():
+            valores[campo.name] = _converter(campo.name, campo.type, bruto.strip())
+    valores.update(sobrescritas)
+    return Settings(**valores)
+
+_configuracoes_atuais: Optional[Settings] = None
+
+# Configurações em uso pela aplicação (carregadas uma única vez, sob demanda)
+def obter_configuracoes() -> Settings:
+    global _configuracoes_atuais
+    if _configuracoes_atuais is None:
+        _configuracoes_atuais = carregar_configuracoes()
+    return _configuracoes_atuais
+
+def definir_configuracoes(settings: Settings):
+    global _configuracoes_atuais
+    _configuracoes_atuais = settings
@@ -1,22 +1,115 @@
-from sqlalchemy import create_engine
+import os
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.config import Settings
+from app.utils.metricas import instrumentar_engine
 
-# URL de conexão com o banco de dados SQLite
-DATABASE_URL = "sqlite:///./livros.db"
+# Métodos HTTP atendidos pelo engine de leitura
+METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
 
-# Configurar o engine do banco de dados
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def _sqlite_em_memoria(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
 
-# Criar uma sessão local
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Aplica os pragmas do SQLite a cada nova conexão: WAL deixa leitores e o escritor trabalharem em paralelo
+def _aplicar_pragmas_sqlite(engine, settings: Settings, somente_leitura: bool):
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not somente_leitura:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")  # O SQLite só aplica as regras ON DELETE com isso ligado
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+# O pysqlite só abre a transação no primeiro INSERT/UPDATE/DELETE, e um SAVEPOINT fora de transação
+# abre e fecha (com commit) a sua própria. Neste modo (receita do SQLAlchemy para o pysqlite) quem
+# abre a transação é o evento "begin", já com o lock de escrita: um lote inteiro vira um único COMMIT.
+def _transacoes_explicitas_sqlite(engine):
+    @event.listens_for(engine, "connect")
+    def _sem_transacao_implicita(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+# Configurar o engine do banco de dados a partir das configurações
+def criar_engine(url: str, settings: Settings, somente_leitura: bool = False, transacoes_explicitas: bool = False):
+    url = make_url(url)
+    # Conexões velhas já são trocadas por pool_recycle; o ping por checkout fica opcional
+    opcoes = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if url.get_backend_name() == "sqlite":
+        opcoes["connect_args"] = {"check_same_thread": False}
+    if not _sqlite_em_memoria(url):
+        opcoes.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle,
+            pool_timeout=settings.db_pool_timeout,
+        )
+
+    engine = create_engine(url, **opcoes)
+    if url.get_backend_name() == "sqlite":
+        _aplicar_pragmas_sqlite(engine, settings, somente_leitura)
+        if transacoes_explicitas:
+            _transacoes_explicitas_sqlite(engine)
+    instrumentar_engine(engine)
+    return engine
+
+# Criar as sessões: SessionLocal escreve no banco principal, SessionLeitura lê da réplica (ou do mesmo banco)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False)
+
+engine = None
+engine_leitura = None
+engine_lotes = None  # Escrita agrupada: várias escritas por transação (ver _transacoes_explicitas_sqlite)
+
+# (Re)cria os engines de escrita e de leitura e associa as sessões a eles
+def configurar_banco(settings: Settings):
+    global engine, engine_leitura, engine_lotes
+    engine = criar_engine(settings.database_url, settings)
+    # Só o SQLite em arquivo precisa de um engine à parte; as sessões continuam no modo padrão do
+    # pysqlite, em que uma leitura antes da escrita não segura a transação aberta
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite" and not _sqlite_em_memoria(url):
+        engine_lotes = criar_engine(settings.database_url, settings, transacoes_explicitas=True)
+    else:
+        engine_lotes = engine
+    url_leitura = settings.database_read_url or settings.database_url
+    if _sqlite_em_memoria(make_url(url_leitura)):
+        engine_leitura = engine  # Banco em memória só existe na própria conexão
+    else:
+        engine_leitura = criar_engine(url_leitura, settings, somente_leitura=True)
+    SessionLocal.configure(bind=engine)
+    SessionLeitura.configure(bind=engine_leitura)
+
+# Fecha as conexões dos pools (desligamento da aplicação)
+def encerrar_banco():
+    for atual in {engine, engine_leitura, engine_lotes} - {None}:
+        atual.dispose()
+
+# Depois de um fork o processo filho não pode usar as conexões abertas pelo pai: dispose(close=False)
+# esvazia o pool do filho sem fechar os sockets, que continuam sendo do pai
+def _descartar_conexoes_herdadas():
+    for atual in {engine, engine_leitura, engine_lotes} - {None}:
+        atual.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_conexoes_herdadas)
 
 # Base para os modelos
 Base = declarative_base()
 
-# Função para obter a sessão do banco de dados
-def get_db():
-    db = SessionLocal()
+# Função para obter a sessão do banco de dados (leitura para GET, escrita para as demais)
+def get_db(request: Request):
+    db = SessionLeitura() if request.method in METODOS_LEITURA else SessionLocal()
     try:
         yield db
     finally:
@@ -1,112 +1,386 @@
+import asyncio
 import logging
-from fastapi import FastAPI, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from app.models.livro import Livro
-from app.database import engine, Base, get_db
-from app.models.user import Usuario
-from app.utils.auth import pwd_context, criar_acesso_token, get_current_user  # Importa get_current_user e o OAuth2 centralizado
+from app import database
+from app.config import Settings, carregar_configuracoes, definir_configuracoes
+from app.database import get_db
+from app.schema import inicializar_banco
+from app.utils.auth import cache_usuarios, criar_acesso_token, get_current_user, UsuarioAutenticado  # Importa get_current_user e o OAuth2 centralizado
 from pydantic import BaseModel
-import os
-from dotenv import load_dotenv
+from datetime import datetime
 from app.models.categoria import Categoria
-from app.services.categoria_service import criar_categoria_service, listar_categorias_service
-from typing import List
+from app.services.categoria_service import (
+    atualizar_categoria_service,
+    criar_categoria_service,
+    deletar_categoria_service,
+    listar_categorias_service,
+    listar_estatisticas_service,
+    reatribuir_livros_service,
+)
+from app.services.facetas_service import condicoes_facetadas, consulta_pagina, contar_facetas
+from app.services.alteracoes_service import listar_alteracoes
+from app.services.escrita_agrupada import escritor_agrupado
+from app.services.sincronizacao import aplicar_alteracoes, posicao_atual, sincronizador_alteracoes
+from app.services.sugestoes import SUGESTOES_MAXIMO, SUGESTOES_PADRAO, indice_sugestoes
+from app.services.livro_service import (
+    atualizar_livro_service,
+    colunas_projetadas,
+    condicoes_filtro,
+    criar_livro_service,
+    deletar_livros_service,
+)
+from app.services.busca_service import extrair_termos, buscar_livros_texto
+from app.services.cache_respostas import (
+    CHAVE_CATEGORIAS,
+    RespostaEmCache,
+    cache_respostas,
+    chave_livro,
+    etag_conteudo,
+    etag_livro,
+    invalidar_categorias,
+    invalidar_livro,
+    invalidar_livros_da_categoria,
+    invalidar_todos_livros,
+    responder,
+    serializar,
+)
+from app.services.exportacao_service import exportar_csv, exportar_ndjson
+from app.services.importacao_service import (
+    LinhaMuitoLonga,
+    ResultadoImportacao,
+    inserir_lote,
+    ler_linhas,
+    registros_csv,
+    registros_ndjson,
+    validar_registro,
+)
+from typing import List, Union
 from app.models.categoria import CategoriaResponse  # Modelo de resposta Pydantic
+from app.schemas.categoria import CategoriaUpdate
+from app.schemas.livro import (
+    AlteracaoLivroResponse,
+    LivroComCategoria,
+    LivroResponse,
+    LivroUpdate,
+    Pagina,
+    PaginaAlteracoes,
+    PaginaFacetada,
+)
+from app.utils.hash_senha import pool_hash
+from app.repositories.user import criar_usuario, buscar_usuario_por_nome
+from app.utils.logs import AMOSTRAR, configurar_logs, encerrar_logs
+from app.utils.compressao import MiddlewareCompressao, configuracao_compressao
+from app.utils.metricas import MiddlewareMetricas, registro_metricas
+from app.utils.paginacao import TAMANHO_PAGINA_PADRAO, TAMANHO_PAGINA_MAXIMO, codificar_cursor, codificar_posicao, decodificar_cursor, decodificar_posicao
 
-# Carregar variáveis de ambiente
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-
-# Configuração do logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-
-# Criação das tabelas no banco
-Base.metadata.create_all(bind=engine)
+router = APIRouter()
 
 # -------------------------------------------
 # Endpoints de Livros
 # -------------------------------------------
 
-@app.get("/")
+@router.get("/")
 def read_root():
     return {"message": "Bem-vindo à API de Gerenciamento de Livros!"}
 
-@app.post("/livros/", status_code=201)
+# Métricas de latência, status e uso do banco por rota, no formato texto do Prometheus
+@router.get("/metrics", include_in_schema=False)
+def metricas():
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+@router.post("/livros/", status_code=201, response_model=LivroResponse)
 def criar_livro(
     titulo: str,
     autor: str,
     ano: int,
     genero: str,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
-    novo_livro = Livro(titulo=titulo, autor=autor, ano=ano, genero=genero)
-    db.add(novo_livro)
-    db.commit()
-    db.refresh(novo_livro)
-    logger.info(f"Livro '{titulo}' criado por {current_user.nome_usuario}")  # Log com o nome do usuário
+    novo_livro = criar_livro_service(db, {"titulo": titulo, "autor": autor, "ano": ano, "genero": genero})
+    indice_sugestoes.atualizar(novo_livro["id"], novo_livro["titulo"], novo_livro["autor"])
+    logger.info("Livro '%s' criado por %s", titulo, current_user.nome_usuario)  # Log com o nome do usuário
     return novo_livro
 
-@app.get("/livros/")
-def buscar_livro_por_parametros(
+@router.post("/livros/bulk")
+async def importar_livros(
+    request: Request,
+    formato: str = Query(None, pattern="^(ndjson|csv)$"),
+    lote: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
+):
+    # Importação em lote: o corpo (NDJSON ou CSV) é lido em streaming e gravado em lotes
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    linhas = ler_linhas(request.stream())
+    registros = registros_csv(linhas) if formato == "csv" else registros_ndjson(linhas)
+
+    resultado = ResultadoImportacao()
+    pendentes = []
+
+    async def gravar(pendentes):
+        criados, erros = await run_in_threadpool(inserir_lote, db, pendentes)
+        for livro_id, titulo, autor in criados:
+            indice_sugestoes.atualizar(livro_id, titulo, autor)
+        resultado.inseridos += len(criados)
+        for numero, mensagem in erros:
+            resultado.registrar_erro(numero, mensagem)
+
+    try:
+        async for numero, registro in registros:
+            valores, erro = validar_registro(registro)
+            if erro:
+                resultado.registrar_erro(numero, erro)
+                continue
+            pendentes.append((numero, valores))
+            if len(pendentes) >= lote:
+                await gravar(pendentes)
+                pendentes = []
+        if pendentes:
+            await gravar(pendentes)
+    except LinhaMuitoLonga:
+        logger.warning("Importação interrompida por linha muito longa após %s livros.", resultado.inseridos)  # Log de erro
+        raise HTTPException(
+            status_code=413,
+            detail={"mensagem": "Linha excede o tamanho máximo permitido", **resultado.como_dict()},
+        )
+
+    logger.info("%s livro(s) importado(s) por %s, %s com erro.", resultado.inseridos, current_user.nome_usuario, resultado.com_erro)  # Log com o nome do usuário
+    return resultado.como_dict()
+
+# Corta o registro extra buscado para saber se há próxima página e monta o cursor
+def _fatiar_pagina(livros, limite: int, id_do_livro):
+    if len(livros) <= limite:
+        return livros, None
+    livros = livros[:limite]
+    return livros, codificar_cursor(id_do_livro(livros[-1]))
+
+# ?fields= seleciona colunas de livros; a categoria embutida precisa da entidade completa
+def _colunas_da_requisicao(fields: str, incluir_categoria: bool):
+    colunas = colunas_projetadas(fields)
+    if colunas and incluir_categoria:
+        raise HTTPException(status_code=400, detail="fields não pode ser combinado com incluir_categoria")
+    return colunas
+
+@router.get("/livros/", response_model=Union[Pagina[LivroComCategoria], Pagina[LivroResponse]])
+def listar_livros(
     titulo: str = None,
     autor: str = None,
     ano: int = None,
     genero: str = None,
+    limite: int = Query(TAMANHO_PAGINA_PADRAO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    cursor: str = None,
+    incluir_categoria: bool = False,
+    fields: str = None,
     db: Session = Depends(get_db)
 ):
-    print(f"Parâmetro recebido para ano: {ano}")
+    # Paginação por keyset em Livro.id: cada página custa o mesmo, independente da profundidade
+    ultimo_id = decodificar_cursor(cursor)
+    colunas = _colunas_da_requisicao(fields, incluir_categoria)
+    condicoes = condicoes_filtro(titulo, autor, ano, genero)
+    if ultimo_id is not None:
+        condicoes.append(Livro.id > ultimo_id)
 
-    if not any([titulo, autor, ano, genero]):
-        raise HTTPException(
-            status_code=400,
-            detail="Pelo menos um parâmetro de consulta deve ser fornecido."
-        )
+    if colunas:
+        # Projeção: o SELECT lê só as colunas pedidas e a resposta sai direto das linhas
+        consulta = select(*colunas).where(*condicoes).order_by(Livro.id).limit(limite + 1)
+        livros = [dict(livro) for livro in db.execute(consulta).mappings()]
+        livros, proximo = _fatiar_pagina(livros, limite, lambda livro: livro["id"])
+        logger.info("Listando %s livros.", len(livros), extra=AMOSTRAR)  # Log de listagem de livros
+        return ORJSONResponse({"items": livros, "next": proximo})
 
     query = db.query(Livro)
-    
-    if titulo and titulo.strip():
-        query = query.filter(Livro.titulo.ilike(f"%{titulo.strip()}%"))
-    if autor and autor.strip():
-        query = query.filter(Livro.autor.ilike(f"%{autor.strip()}%"))
-    if ano:
-        query = query.filter(Livro.ano == ano)
-    if genero and genero.strip():
-        query = query.filter(Livro.genero.ilike(f"%{genero.strip()}%"))
-    
-    livros = query.all()
-    
-    if not livros:
-        logger.warning("Nenhum livro encontrado com os parâmetros fornecidos.")  # Log de erro
-        raise HTTPException(status_code=404, detail="Nenhum livro encontrado")
-    
-    logger.info(f"{len(livros)} livro(s) encontrado(s) com os parâmetros fornecidos.")  # Log de sucesso
-    return livros
-
-@app.get("/livros/")
-def listar_livros(db: Session = Depends(get_db)):
-    livros = db.query(Livro).all()
-    logger.info(f"Listando {len(livros)} livros.")  # Log de listagem de livros
-    return livros
-
-@app.get("/livros/{livro_id}")
-def buscar_livro(livro_id: int, db: Session = Depends(get_db)):
-    livro = db.query(Livro).filter(Livro.id == livro_id).first()
-    if not livro:
-        logger.warning(f"Livro com ID {livro_id} não encontrado.")  # Log de erro
-        raise HTTPException(status_code=404, detail="Livro não encontrado")
-    logger.info(f"Livro com ID {livro_id} encontrado: {livro.titulo}")  # Log de sucesso
-    return livro
+    if incluir_categoria:
+        query = query.options(selectinload(Livro.categoria))
+    # Busca um registro a mais para saber se existe próxima página
+    livros = query.filter(*condicoes).order_by(Livro.id).limit(limite + 1).all()
+    livros, proximo = _fatiar_pagina(livros, limite, lambda livro: livro.id)
+
+    logger.info("Listando %s livros.", len(livros), extra=AMOSTRAR)  # Log de listagem de livros
+    modelo = LivroComCategoria if incluir_categoria else LivroResponse
+    return ORJSONResponse(Pagina[modelo](items=livros, next=proximo).model_dump())
+
+# Exclusão em massa em um único DELETE. Ao contrário da listagem, os filtros são de igualdade:
+# com texto parcial, "?titulo=%" (ou "_", ou uma letra) apagaria o catálogo inteiro ou quase.
+@router.delete("/livros/")
+def deletar_livros(
+    titulo: str = None,
+    autor: str = None,
+    ano: int = None,
+    genero: str = None,
+    categoria_id: int = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
+):
+    def valor(texto):
+        return texto.strip() if texto and texto.strip() else None
+
+    condicoes = condicoes_facetadas(titulo=valor(titulo), autor=valor(autor), ano=ano, genero=valor(genero), categoria_id=categoria_id)
+    if not condicoes:
+        # Sem filtro a operação apagaria o catálogo inteiro
+        raise HTTPException(status_code=400, detail="Informe ao menos um filtro")
+    # Os livros removidos saem do índice de sugestões pelas lápides do feed, lidas em lotes
+    desde = posicao_atual(database.engine)
+    removidos = deletar_livros_service(db, condicoes)
+    invalidar_todos_livros()
+    aplicar_alteracoes(database.engine, desde)
+    logger.info("%s livro(s) deletado(s) em massa por %s", removidos, current_user.nome_usuario)  # Log com o nome do usuário
+    return {"livros_removidos": removidos}
+
+# Feed de criações, atualizações e exclusões para sincronizar cópias do catálogo. O cursor é a posição
+# da última alteração entregue; sem since, começa do início (o catálogo inteiro, livro a livro).
+@router.get("/livros/changes", response_model=PaginaAlteracoes)
+def listar_alteracoes_livros(
+    since: str = None,
+    limite: int = Query(TAMANHO_PAGINA_MAXIMO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    db: Session = Depends(get_db),
+):
+    desde = decodificar_posicao(since) or (0, 0)
+    alteracoes, tem_mais = listar_alteracoes(db, desde, limite)
+    itens = [
+        AlteracaoLivroResponse(
+            seq=seq,
+            id=livro_id,
+            operacao=operacao,
+            alterado_em=alterado_em,
+            livro=LivroResponse.model_validate(livro) if livro is not None and operacao != "D" else None,
+        )
+        for _, seq, livro_id, operacao, alterado_em, livro in alteracoes
+    ]
+    proximo = codificar_posicao((alteracoes[-1].xid, alteracoes[-1].seq) if alteracoes else desde)
+    logger.info("%s alteração(ões) de livros desde a posição %s.", len(itens), desde, extra=AMOSTRAR)  # Log de listagem
+    return ORJSONResponse(PaginaAlteracoes(items=itens, next=proximo, tem_mais=tem_mais).model_dump())
+
+# Autocompletar de títulos e autores, servido do índice de prefixos em memória (sem banco). Síncrono:
+# roda no threadpool, para a espera pelo lock do índice durante uma escrita não travar o event loop.
+@router.get("/livros/suggest")
+def sugerir_livros(q: str, limite: int = Query(SUGESTOES_PADRAO, ge=1, le=SUGESTOES_MAXIMO)):
+    return {"sugestoes": indice_sugestoes.sugerir(q, limite)}
+
+# Página de resultados e contagens por genero, ano e categoria_id em uma única chamada. Os filtros são
+# de igualdade para usarem os índices compostos de Livro (ver benchmarks/plano_consultas.py).
+@router.get("/livros/facetas", response_model=PaginaFacetada)
+def buscar_livros_facetados(
+    genero: str = None,
+    ano: int = None,
+    categoria_id: int = None,
+    autor: str = None,
+    limite: int = Query(TAMANHO_PAGINA_PADRAO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    cursor: str = None,
+    fields: str = None,
+    db: Session = Depends(get_db),
+):
+    condicoes = condicoes_facetadas(genero=genero, ano=ano, categoria_id=categoria_id, autor=autor)
+    colunas = colunas_projetadas(fields)
+    resultado = db.execute(consulta_pagina(condicoes, decodificar_cursor(cursor), limite, colunas))
+    if colunas:
+        livros = [dict(livro) for livro in resultado.mappings()]
+        livros, proximo = _fatiar_pagina(livros, limite, lambda livro: livro["id"])
+    else:
+        livros, proximo = _fatiar_pagina(resultado.scalars().all(), limite, lambda livro: livro.id)
+
+    facetas = contar_facetas(db, condicoes)
+    logger.info("Busca facetada retornou %s livros.", len(livros), extra=AMOSTRAR)  # Log de listagem de livros
+    if colunas:
+        return ORJSONResponse({"items": livros, "next": proximo, "facetas": facetas})
+    return ORJSONResponse(PaginaFacetada(items=livros, next=proximo, facetas=facetas).model_dump())
+
+@router.get("/livros/busca", response_model=Pagina[LivroResponse])
+def buscar_livros(
+    q: str,
+    limite: int = Query(TAMANHO_PAGINA_PADRAO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    fields: str = None,
+    db: Session = Depends(get_db)
+):
+    # Busca textual em titulo, autor e genero, ordenada por relevância e com casamento por prefixo
+    termos = extrair_termos(q)
+    if not termos:
+        raise HTTPException(status_code=400, detail="Informe ao menos um termo de busca.")
 
+    colunas = colunas_projetadas(fields)
+    livros = buscar_livros_texto(db, termos, limite, colunas)
+    logger.info("%s livro(s) encontrado(s) para a busca '%s'.", len(livros), q, extra=AMOSTRAR)  # Log de sucesso
+    if colunas:
+        return ORJSONResponse({"items": livros, "next": None})
+    return ORJSONResponse(Pagina[LivroResponse](items=livros).model_dump())
 
+@router.get("/livros/export")
+def exportar_livros(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    atualizado_desde: datetime = None,
+):
+    # Exporta o catálogo em streaming; as linhas são lidas do banco em lotes enquanto são enviadas
+    logger.info("Exportando livros em %s (atualizado_desde=%s).", formato, atualizado_desde)  # Log de exportação
+    if formato == "csv":
+        return StreamingResponse(
+            exportar_csv(atualizado_desde),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="livros.csv"'},
+        )
+    return StreamingResponse(exportar_ndjson(atualizado_desde), media_type="application/x-ndjson")
+
+@router.get("/livros/{livro_id}", response_model=Union[LivroComCategoria, LivroResponse])
+def buscar_livro(
+    livro_id: int,
+    request: Request,
+    incluir_categoria: bool = False,
+    fields: str = None,
+    db: Session = Depends(get_db)
+):
+    colunas = _colunas_da_requisicao(fields, incluir_categoria)
+    if colunas:
+        # Projeções não passam pelo cache de respostas (a invalidação só conhece as duas formas completas)
+        livro = db.execute(select(*colunas).where(Livro.id == livro_id)).mappings().first()
+        if not livro:
+            logger.warning("Livro com ID %s não encontrado.", livro_id)  # Log de erro
+            raise HTTPException(status_code=404, detail="Livro não encontrado")
+        return ORJSONResponse(dict(livro))
 
-@app.put("/livros/{livro_id}")
+    # Resposta servida do cache quando possível; If-None-Match com a ETag atual recebe 304
+    chave = chave_livro(livro_id, incluir_categoria)
+    entrada = cache_respostas.obter(chave)
+    if entrada is None:
+        marca = _preparar_leitura_para_cache(db, chave)
+        query = db.query(Livro).filter(Livro.id == livro_id)
+        if incluir_categoria:
+            query = query.options(selectinload(Livro.categoria))
+        livro = query.first()
+        if not livro:
+            logger.warning("Livro com ID %s não encontrado.", livro_id)  # Log de erro
+            raise HTTPException(status_code=404, detail="Livro não encontrado")
+        modelo = LivroComCategoria if incluir_categoria else LivroResponse
+        corpo = serializar(modelo.model_validate(livro).model_dump())
+        entrada = RespostaEmCache(
+            corpo=corpo,
+            etag=etag_livro(livro, corpo if incluir_categoria else None),
+            categoria_id=livro.categoria_id,
+        )
+        cache_respostas.definir(chave, entrada, desde=marca)
+    logger.info("Livro com ID %s encontrado.", livro_id, extra=AMOSTRAR)  # Log de sucesso
+    return responder(request, entrada)
+
+# Antes de ler do banco o que vai para o cache de respostas: guarda a marca de invalidação (uma
+# escrita que termine durante a leitura impede a gravação) e, se a chave acabou de ser invalidada,
+# lê do banco principal, porque a réplica pode ainda não ter a escrita
+def _preparar_leitura_para_cache(db: Session, chave) -> int:
+    marca = cache_respostas.marca()
+    if cache_respostas.pendente(chave):
+        db.bind = database.engine
+    return marca
+
+
+
+@router.put("/livros/{livro_id}", response_model=LivroResponse)
 def atualizar_livro(
     livro_id: int,
     titulo: str,
@@ -114,92 +388,171 @@ def atualizar_livro(
     ano: int,
     genero: str,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
-    livro = db.query(Livro).filter(Livro.id == livro_id).first()
-    if not livro:
-        logger.warning(f"Livro com ID {livro_id} não encontrado para atualização.")  # Log de erro
+    valores = {"titulo": titulo, "autor": autor, "ano": ano, "genero": genero}
+    return _atualizar_livro(db, livro_id, valores, current_user)
+
+@router.patch("/livros/{livro_id}", response_model=LivroResponse)
+def atualizar_livro_parcial(
+    livro_id: int,
+    dados: LivroUpdate,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
+):
+    valores = dados.model_dump(exclude_unset=True)
+    if not valores:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo para atualizar")
+    return _atualizar_livro(db, livro_id, valores, current_user)
+
+# PUT e PATCH: um único UPDATE ... RETURNING; o 404 vem da contagem de linhas afetadas
+def _atualizar_livro(db: Session, livro_id: int, valores: dict, current_user: UsuarioAutenticado):
+    try:
+        livro = atualizar_livro_service(db, livro_id, valores)
+    except IntegrityError:
+        # Só a chave estrangeira de categoria_id pode falhar aqui
+        db.rollback()
+        logger.warning("Categoria com ID %s não encontrada para o livro %s.", valores.get("categoria_id"), livro_id)  # Log de erro
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    if livro is None:
+        logger.warning("Livro com ID %s não encontrado para atualização.", livro_id)  # Log de erro
         raise HTTPException(status_code=404, detail="Livro não encontrado")
-    
-    livro.titulo = titulo
-    livro.autor = autor
-    livro.ano = ano
-    livro.genero = genero
-    db.commit()
-    db.refresh(livro)
-    logger.info(f"Livro com ID {livro_id} atualizado por {current_user.nome_usuario}")  # Log com o nome do usuário
+    invalidar_livro(livro_id)
+    indice_sugestoes.atualizar(livro_id, livro["titulo"], livro["autor"])
+    logger.info("Livro com ID %s atualizado por %s", livro_id, current_user.nome_usuario)  # Log com o nome do usuário
     return livro
 
-@app.delete("/livros/{livro_id}")
+@router.delete("/livros/{livro_id}")
 def deletar_livro(
     livro_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
     livro = db.query(Livro).filter(Livro.id == livro_id).first()
     if not livro:
-        logger.warning(f"Tentativa de exclusão de livro com ID {livro_id}, mas livro não encontrado.")  # Log de erro
+        logger.warning("Tentativa de exclusão de livro com ID %s, mas livro não encontrado.", livro_id)  # Log de erro
         raise HTTPException(status_code=404, detail="Livro não encontrado")
     db.delete(livro)
     db.commit()
-    logger.info(f"Livro com ID {livro_id} deletado por {current_user.nome_usuario}")  # Log com o nome do usuário
+    invalidar_livro(livro_id)
+    indice_sugestoes.remover(livro_id)
+    logger.info("Livro com ID %s deletado por %s", livro_id, current_user.nome_usuario)  # Log com o nome do usuário
     return {"message": "Livro deletado com sucesso"}
 
 # -------------------------------------------
 # Endpoints de Categorias
 # -------------------------------------------
 
-@app.post("/categorias/", response_model=CategoriaResponse)
+@router.post("/categorias/", response_model=CategoriaResponse)
 def criar_categoria(
     nome: str,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
-    categoria = Categoria(nome=nome)
-    db.add(categoria)
-    db.commit()
-    db.refresh(categoria)
-    logger.info(f"Categoria '{nome}' criada por {current_user.nome_usuario}.")  # Log com o nome do usuário
-    return CategoriaResponse.from_orm(categoria)
+    try:
+        categoria = criar_categoria_service(db, nome)
+    except IntegrityError:
+        _categoria_duplicada(db, nome)
+    invalidar_categorias()
+    logger.info("Categoria '%s' criada por %s.", nome, current_user.nome_usuario)  # Log com o nome do usuário
+    return categoria
+
+# O nome da categoria é único: a violação vira 409 em vez de erro interno
+def _categoria_duplicada(db: Session, nome: str):
+    db.rollback()
+    logger.warning("Já existe uma categoria com o nome '%s'.", nome)  # Log de erro
+    raise HTTPException(status_code=409, detail="Já existe uma categoria com esse nome")
+
+@router.get("/categorias/", response_model=List[CategoriaResponse])
+def listar_categorias(request: Request, db: Session = Depends(get_db)):
+    entrada = cache_respostas.obter(CHAVE_CATEGORIAS)
+    if entrada is None:
+        marca = _preparar_leitura_para_cache(db, CHAVE_CATEGORIAS)
+        categorias = listar_categorias_service(db)
+        logger.info("Listando %s categorias.", len(categorias), extra=AMOSTRAR)  # Log de listagem de categorias
+        corpo = serializar([CategoriaResponse.from_orm(categoria).model_dump() for categoria in categorias])
+        entrada = RespostaEmCache(corpo=corpo, etag=etag_conteudo(corpo))
+        cache_respostas.definir(CHAVE_CATEGORIAS, entrada, desde=marca)
+    return responder(request, entrada)
 
-@app.get("/categorias/", response_model=List[CategoriaResponse])
-def listar_categorias(db: Session = Depends(get_db)):
-    categorias = listar_categorias_service(db)
-    logger.info(f"Listando {len(categorias)} categorias.")  # Log de listagem de categorias
-    return [CategoriaResponse.from_orm(categoria) for categoria in categorias]
+@router.get("/categorias/stats")
+def estatisticas_categorias(db: Session = Depends(get_db)):
+    # Contagem de livros por categoria e por gênero/década, lida da tabela de resumo
+    estatisticas = listar_estatisticas_service(db)
+    logger.info("Estatísticas de %s categorias.", len(estatisticas['categorias']), extra=AMOSTRAR)  # Log de estatísticas
+    return estatisticas
 
-@app.put("/categorias/{categoria_id}", response_model=CategoriaResponse)
+@router.put("/categorias/{categoria_id}", response_model=CategoriaResponse)
 def atualizar_categoria(
     categoria_id: int,
     nome: str,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
-    categoria = db.query(Categoria).filter(Categoria.id == categoria_id).first()
-    if not categoria:
-        logger.warning(f"Categoria com ID {categoria_id} não encontrada para atualização.")  # Log de erro
+    return _atualizar_categoria(db, categoria_id, {"nome": nome}, current_user)
+
+@router.patch("/categorias/{categoria_id}", response_model=CategoriaResponse)
+def atualizar_categoria_parcial(
+    categoria_id: int,
+    dados: CategoriaUpdate,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
+):
+    valores = dados.model_dump(exclude_unset=True)
+    if not valores:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo para atualizar")
+    return _atualizar_categoria(db, categoria_id, valores, current_user)
+
+# PUT e PATCH: um único UPDATE ... RETURNING; o 404 vem da contagem de linhas afetadas
+def _atualizar_categoria(db: Session, categoria_id: int, valores: dict, current_user: UsuarioAutenticado):
+    try:
+        categoria = atualizar_categoria_service(db, categoria_id, valores)
+    except IntegrityError:
+        _categoria_duplicada(db, valores["nome"])
+    if categoria is None:
+        logger.warning("Categoria com ID %s não encontrada para atualização.", categoria_id)  # Log de erro
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
-    
-    categoria.nome = nome
-    db.commit()
-    db.refresh(categoria)
-    logger.info(f"Categoria com ID {categoria_id} atualizada para '{nome}' por {current_user.nome_usuario}.")  # Log com o nome do usuário
-    return CategoriaResponse.from_orm(categoria)
+    # A categoria embutida nas respostas dos livros também muda
+    invalidar_categorias()
+    invalidar_livros_da_categoria(categoria_id)
+    logger.info("Categoria com ID %s atualizada para '%s' por %s.", categoria_id, categoria["nome"], current_user.nome_usuario)  # Log com o nome do usuário
+    return categoria
 
-@app.delete("/categorias/{categoria_id}")
+@router.delete("/categorias/{categoria_id}")
 def deletar_categoria(
     categoria_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user),  # Utiliza get_current_user
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
 ):
-    categoria = db.query(Categoria).filter(Categoria.id == categoria_id).first()
-    if not categoria:
-        logger.warning(f"Tentativa de exclusão de categoria com ID {categoria_id}, mas categoria não encontrada.")  # Log de erro
+    desde = posicao_atual(database.engine)
+    livros_removidos = deletar_categoria_service(db, categoria_id)
+    if livros_removidos is None:
+        logger.warning("Tentativa de exclusão de categoria com ID %s, mas categoria não encontrada.", categoria_id)  # Log de erro
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
-    db.delete(categoria)
-    db.commit()
-    logger.info(f"Categoria com ID {categoria_id} deletada por {current_user.nome_usuario}.")  # Log com o nome do usuário
-    return {"message": "Categoria deletada com sucesso"}
+    # Os livros da categoria foram excluídos junto, então suas respostas em cache também saem
+    invalidar_categorias()
+    invalidar_livros_da_categoria(categoria_id)
+    aplicar_alteracoes(database.engine, desde)
+    logger.info("Categoria com ID %s e %s livro(s) deletados por %s.", categoria_id, livros_removidos, current_user.nome_usuario)  # Log com o nome do usuário
+    return {"message": "Categoria deletada com sucesso", "livros_removidos": livros_removidos}
+
+# Move todos os livros da categoria para a categoria destino (sem destino, ficam sem categoria)
+@router.post("/categorias/{categoria_id}/reatribuir")
+def reatribuir_livros(
+    categoria_id: int,
+    destino: int = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),  # Utiliza get_current_user
+):
+    for id_verificado in (categoria_id, destino):
+        if id_verificado is not None and db.get(Categoria, id_verificado) is None:
+            logger.warning("Categoria com ID %s não encontrada para reatribuição.", id_verificado)  # Log de erro
+            raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    atualizados = reatribuir_livros_service(db, categoria_id, destino)
+    # A categoria embutida nas respostas em cache dos livros movidos mudou
+    invalidar_livros_da_categoria(categoria_id)
+    logger.info("%s livro(s) movidos da categoria %s para %s por %s.", atualizados, categoria_id, destino, current_user.nome_usuario)  # Log com o nome do usuário
+    return {"livros_atualizados": atualizados}
 
 # -------------------------------------------
 # Endpoints de Autenticação
@@ -209,22 +562,93 @@ class LoginData(BaseModel):
     username: str
     password: str
 
-@app.post("/register")
-def register(nome_usuario: str, senha: str, db: Session = Depends(get_db)):
-    hashed_senha = pwd_context.hash(senha)
-    novo_usuario = Usuario(nome_usuario=nome_usuario, senha_hash=hashed_senha)
-    db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
-    logger.info(f"Novo usuário registrado: {nome_usuario}")  # Log de sucesso
-    return {"message": "Usuário registrado com sucesso", "user": novo_usuario.nome_usuario}
-
-@app.post("/login")
-def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    usuario = db.query(Usuario).filter(Usuario.nome_usuario == username).first()
-    if not usuario or not pwd_context.verify(password, usuario.senha_hash):
+@router.post("/register")
+async def register(nome_usuario: str, senha: str, db: Session = Depends(get_db)):
+    # O bcrypt roda no pool de processos dedicado, fora do threadpool das demais rotas
+    hashed_senha = await pool_hash.gerar_hash(senha)
+    await run_in_threadpool(criar_usuario, db, nome_usuario, hashed_senha)
+    logger.info("Novo usuário registrado: %s", nome_usuario)  # Log de sucesso
+    return {"message": "Usuário registrado com sucesso", "user": nome_usuario}
+
+@router.post("/login")
+async def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+    usuario = await run_in_threadpool(buscar_usuario_por_nome, db, username)
+    if not usuario:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    nome_usuario = usuario.nome_usuario
+
+    valida, novo_hash = await pool_hash.verificar(password, usuario.senha_hash)
+    if not valida:
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    if novo_hash:
+        # Política de custo do bcrypt mudou: regrava o hash com o custo atual
+        usuario.senha_hash = novo_hash
+        await run_in_threadpool(db.commit)
+        logger.info("Hash de senha do usuário %s atualizado", nome_usuario)  # Log de rehash
 
-    access_token = criar_acesso_token(data={"sub": usuario.nome_usuario})
-    logger.info(f"Usuário {usuario.nome_usuario} autenticado com sucesso")  # Log de sucesso
+    access_token = criar_acesso_token(data={"sub": nome_usuario})
+    logger.info("Usuário %s autenticado com sucesso", nome_usuario)  # Log de sucesso
     return {"access_token": access_token, "token_type": "bearer"}
+
+# -------------------------------------------
+# Criação da aplicação
+# -------------------------------------------
+
+# Aplica as configurações aos componentes da aplicação (sem abrir conexões com o banco)
+def aplicar_configuracoes(settings: Settings):
+    definir_configuracoes(settings)
+    database.configurar_banco(settings)
+    cache_usuarios.configurar(settings.cache_usuarios_tamanho, settings.cache_usuarios_ttl)
+    cache_respostas.configurar(settings.cache_respostas_tamanho, settings.cache_respostas_ttl)
+    pool_hash.configurar(
+        workers=settings.hash_workers,
+        fila_maxima=settings.hash_fila_maxima or settings.hash_workers * 4,
+        rounds=settings.bcrypt_rounds,
+    )
+    escritor_agrupado.configurar(settings.escrita_agrupada, settings.escrita_janela_ms, settings.escrita_lote_maximo)
+    registro_metricas.limite_lento_ms = settings.log_requisicoes_lentas_ms
+    configuracao_compressao.tamanho_minimo = settings.gzip_tamanho_minimo
+    configuracao_compressao.nivel = settings.gzip_nivel
+
+# Partida: carrega as configurações uma vez (se create_app não as recebeu), liga os logs e
+# confere a versão do schema; no desligamento, libera os processos do bcrypt, os logs e as conexões
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    if settings is None:
+        settings = carregar_configuracoes()
+        aplicar_configuracoes(settings)
+        app.state.settings = settings
+    configurar_logs(settings.log_nivel, settings.log_fila_tamanho, settings.log_taxa_amostragem)
+    await run_in_threadpool(inicializar_banco, database.engine)
+    sincronizacao = None
+    if settings.sincronizacao_intervalo_s > 0:
+        # Posiciona antes de construir o índice para não perder escritas feitas nesse meio-tempo
+        await run_in_threadpool(sincronizador_alteracoes.posicionar, database.engine_leitura)
+        sincronizacao = asyncio.create_task(
+            sincronizador_alteracoes.executar_periodicamente(database.engine_leitura, settings.sincronizacao_intervalo_s)
+        )
+    await run_in_threadpool(indice_sugestoes.construir, database.engine_leitura)
+    try:
+        yield
+    finally:
+        if sincronizacao is not None:
+            sincronizacao.cancel()
+        escritor_agrupado.encerrar()
+        pool_hash.encerrar()
+        encerrar_logs()
+        database.encerrar_banco()
+
+def create_app(settings: Settings = None) -> FastAPI:
+    # ORJSONResponse como padrão: serialização em Rust, sem passar pelo jsonable_encoder
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.state.settings = settings
+    if settings is not None:
+        aplicar_configuracoes(settings)
+    app.add_middleware(MiddlewareCompressao)
+    app.add_middleware(MiddlewareMetricas)
+    app.include_router(router)
+    return app
+
+# Aplicação usada pelo uvicorn (app.main:app); as configurações são lidas na partida
+app = create_app()
@@ -0,0 +1,201 @@
+from typing import Optional
+from sqlalchemy import BigInteger, Column, DDL, DateTime, Integer, String, event, func, inspect, text
+from app.database import Base
+from app.models.categoria import Categoria
+from app.models.livro import Livro
+from app.models.user import Usuario
+
+# Feed de alterações de 'livros' para sincronização incremental, mantido por triggers na mesma
+# transação da escrita. Cada livro tem só a sua alteração mais recente: a nova linha substitui a
+# anterior com um seq maior, então quem leu até um seq nunca perde uma mudança posterior.
+# Exclusões ficam como lápides (operacao 'D'), já que a linha em 'livros' deixa de existir.
+# A posição de uma alteração no feed é (xid, seq); ver XID_POSTGRESQL.
+class AlteracaoLivro(Base):
+    __tablename__ = "alteracoes_livros"
+    # AUTOINCREMENT: o SQLite nunca reaproveita um seq, mesmo depois de apagar as linhas mais novas
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    livro_id = Column(Integer, nullable=False, unique=True)  # Sem chave estrangeira: a lápide sobrevive ao livro
+    operacao = Column(String(1), nullable=False)  # I = criação, U = atualização, D = exclusão
+    alterado_em = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    xid = Column(BigInteger, nullable=False, server_default=text("0"))  # Transação que gravou (0 no SQLite)
+
+# Feed interno de alterações e exclusões de 'usuarios' (não exposto pela API): com vários processos,
+# cada um tira do seu cache de autenticação os usuários alterados pelos outros (ver sincronizacao)
+class AlteracaoUsuario(Base):
+    __tablename__ = "alteracoes_usuarios"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    usuario_id = Column(Integer, nullable=False, unique=True)
+    xid = Column(BigInteger, nullable=False, server_default=text("0"))
+
+# Feed interno de criações, alterações e exclusões de 'categorias': a lista de categorias e os livros
+# servidos com a categoria embutida ficam em cache em cada processo (ver sincronizacao)
+class AlteracaoCategoria(Base):
+    __tablename__ = "alteracoes_categorias"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    categoria_id = Column(Integer, nullable=False, unique=True)
+    xid = Column(BigInteger, nullable=False, server_default=text("0"))
+
+# Quem lê o feed avança um cursor e nunca volta: uma alteração só pode ser entregue depois que
+# todas as que vêm antes dela já estão visíveis. No SQLite há um escritor por vez, então a ordem
+# do seq já é a ordem de commit e o xid fica 0. No PostgreSQL a sequence é consumida na hora do
+# INSERT, fora da ordem de commit; em vez de enfileirar os escritores, cada alteração grava o id
+# da sua transação e o feed é lido em ordem de (xid, seq), só até o xmin do snapshot atual
+# (HORIZONTE_POSTGRESQL): toda transação ainda aberta, e toda que vier depois, tem xid >= xmin,
+# então nada pode aparecer antes de uma posição já entregue.
+XID_POSTGRESQL = "pg_current_xact_id()::text::bigint"
+HORIZONTE_POSTGRESQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+# Sem xid, a coluna fica com o padrão 0 (SQLite)
+def _registrar(linha: str, operacao: str, xid: Optional[str] = None) -> str:
+    if xid is None:
+        insercao = f"INSERT INTO alteracoes_livros (livro_id, operacao) VALUES ({linha}.id, {operacao}); "
+    else:
+        insercao = f"INSERT INTO alteracoes_livros (livro_id, operacao, xid) VALUES ({linha}.id, {operacao}, {xid}); "
+    return f"DELETE FROM alteracoes_livros WHERE livro_id = {linha}.id; " + insercao
+
+DDL_ALTERACOES_SQLITE = [
+    DDL("CREATE TRIGGER IF NOT EXISTS livros_alteracoes_ai AFTER INSERT ON livros BEGIN " + _registrar("new", "'I'") + "END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS livros_alteracoes_au AFTER UPDATE ON livros BEGIN " + _registrar("new", "'U'") + "END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS livros_alteracoes_ad AFTER DELETE ON livros BEGIN " + _registrar("old", "'D'") + "END"),
+]
+
+DDL_ALTERACOES_POSTGRESQL = [
+    DDL(
+        "CREATE OR REPLACE FUNCTION livros_alteracoes() RETURNS trigger AS $$ "
+        "BEGIN "
+        "IF TG_OP = 'DELETE' THEN "
+        + _registrar("OLD", "'D'", XID_POSTGRESQL)
+        + "ELSE "
+        + _registrar("NEW", "LEFT(TG_OP, 1)", XID_POSTGRESQL)
+        + "END IF; "
+        "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    ),
+    DDL("DROP TRIGGER IF EXISTS livros_alteracoes ON livros"),
+    DDL(
+        "CREATE TRIGGER livros_alteracoes AFTER INSERT OR UPDATE OR DELETE ON livros "
+        "FOR EACH ROW EXECUTE FUNCTION livros_alteracoes()"
+    ),
+]
+
+_REGISTRAR_USUARIO = (
+    "DELETE FROM alteracoes_usuarios WHERE usuario_id = {linha}.id; "
+    "INSERT INTO alteracoes_usuarios (usuario_id) VALUES ({linha}.id); "
+)
+_REGISTRAR_USUARIO_POSTGRESQL = (
+    "DELETE FROM alteracoes_usuarios WHERE usuario_id = {linha}.id; "
+    "INSERT INTO alteracoes_usuarios (usuario_id, xid) VALUES ({linha}.id, {xid}); "
+)
+
+DDL_ALTERACOES_USUARIOS_SQLITE = [
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS usuarios_alteracoes_au AFTER UPDATE ON usuarios BEGIN "
+        + _REGISTRAR_USUARIO.format(linha="old") + "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS usuarios_alteracoes_ad AFTER DELETE ON usuarios BEGIN "
+        + _REGISTRAR_USUARIO.format(linha="old") + "END"
+    ),
+]
+
+DDL_ALTERACOES_USUARIOS_POSTGRESQL = [
+    DDL(
+        "CREATE OR REPLACE FUNCTION usuarios_alteracoes() RETURNS trigger AS $$ "
+        "BEGIN "
+        + _REGISTRAR_USUARIO_POSTGRESQL.format(linha="OLD", xid=XID_POSTGRESQL)
+        + "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    ),
+    DDL("DROP TRIGGER IF EXISTS usuarios_alteracoes ON usuarios"),
+    DDL(
+        "CREATE TRIGGER usuarios_alteracoes AFTER UPDATE OR DELETE ON usuarios "
+        "FOR EACH ROW EXECUTE FUNCTION usuarios_alteracoes()"
+    ),
+]
+
+_REGISTRAR_CATEGORIA = (
+    "DELETE FROM alteracoes_categorias WHERE categoria_id = {linha}.id; "
+    "INSERT INTO alteracoes_categorias (categoria_id) VALUES ({linha}.id); "
+)
+_REGISTRAR_CATEGORIA_POSTGRESQL = (
+    "DELETE FROM alteracoes_categorias WHERE categoria_id = {linha}.id; "
+    "INSERT INTO alteracoes_categorias (categoria_id, xid) VALUES ({linha}.id, {xid}); "
+)
+
+DDL_ALTERACOES_CATEGORIAS_SQLITE = [
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS categorias_alteracoes_ai AFTER INSERT ON categorias BEGIN "
+        + _REGISTRAR_CATEGORIA.format(linha="new") + "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS categorias_alteracoes_au AFTER UPDATE ON categorias BEGIN "
+        + _REGISTRAR_CATEGORIA.format(linha="old") + "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS categorias_alteracoes_ad AFTER DELETE ON categorias BEGIN "
+        + _REGISTRAR_CATEGORIA.format(linha="old") + "END"
+    ),
+]
+
+DDL_ALTERACOES_CATEGORIAS_POSTGRESQL = [
+    DDL(
+        "CREATE OR REPLACE FUNCTION categorias_alteracoes() RETURNS trigger AS $$ "
+        "BEGIN "
+        "IF TG_OP = 'INSERT' THEN "
+        + _REGISTRAR_CATEGORIA_POSTGRESQL.format(linha="NEW", xid=XID_POSTGRESQL)
+        + "ELSE "
+        + _REGISTRAR_CATEGORIA_POSTGRESQL.format(linha="OLD", xid=XID_POSTGRESQL)
+        + "END IF; "
+        "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    ),
+    DDL("DROP TRIGGER IF EXISTS categorias_alteracoes ON categorias"),
+    DDL(
+        "CREATE TRIGGER categorias_alteracoes AFTER INSERT OR UPDATE OR DELETE ON categorias "
+        "FOR EACH ROW EXECUTE FUNCTION categorias_alteracoes()"
+    ),
+]
+
+# Os triggers são criados junto com as tabelas 'livros', 'usuarios' e 'categorias'
+for tabela, sqlite, postgresql in [
+    (Livro.__table__, DDL_ALTERACOES_SQLITE, DDL_ALTERACOES_POSTGRESQL),
+    (Usuario.__table__, DDL_ALTERACOES_USUARIOS_SQLITE, DDL_ALTERACOES_USUARIOS_POSTGRESQL),
+    (Categoria.__table__, DDL_ALTERACOES_CATEGORIAS_SQLITE, DDL_ALTERACOES_CATEGORIAS_POSTGRESQL),
+]:
+    for ddl in sqlite:
+        event.listen(tabela, "after_create", ddl.execute_if(dialect="sqlite"))
+    for ddl in postgresql:
+        event.listen(tabela, "after_create", ddl.execute_if(dialect="postgresql"))
+
+# Instala (ou atualiza) os triggers em um banco já existente; na primeira instalação, os livros
+# atuais entram no feed como criações, para que um cliente sem cursor receba o catálogo inteiro
+def instalar_alteracoes(conn):
+    if conn.dialect.name == "sqlite":
+        existe = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'livros_alteracoes_ai'")
+        ).first()
+        comandos = DDL_ALTERACOES_SQLITE + DDL_ALTERACOES_USUARIOS_SQLITE + DDL_ALTERACOES_CATEGORIAS_SQLITE
+    elif conn.dialect.name == "postgresql":
+        existe = conn.execute(text("SELECT 1 FROM pg_trigger WHERE tgname = 'livros_alteracoes'")).first()
+        comandos = DDL_ALTERACOES_POSTGRESQL + DDL_ALTERACOES_USUARIOS_POSTGRESQL + DDL_ALTERACOES_CATEGORIAS_POSTGRESQL
+    else:
+        return
+    # Bancos de antes da posição (xid, seq) ganham a coluna; as linhas antigas ficam com xid 0
+    for tabela in ("alteracoes_livros", "alteracoes_usuarios", "alteracoes_categorias"):
+        if "xid" not in {coluna["name"] for coluna in inspect(conn).get_columns(tabela)}:
+            conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN xid BIGINT NOT NULL DEFAULT 0"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_posicao ON {tabela} (xid, seq)"))
+    for ddl in comandos:
+        conn.execute(ddl)
+    if existe:
+        return
+    conn.execute(text(
+        "INSERT INTO alteracoes_livros (livro_id, operacao) "
+        "SELECT id, 'I' FROM livros WHERE id NOT IN (SELECT livro_id FROM alteracoes_livros) ORDER BY id"
+    ))
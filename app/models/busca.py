@@ -0,0 +1,53 @@
+from sqlalchemy import DDL, event, text
+from app.models.livro import Livro
+
+# Índice de texto completo (SQLite FTS5) espelhando titulo, autor e genero da tabela 'livros'.
+# A tabela virtual usa conteúdo externo, então só guarda o índice; os triggers a mantêm em sincronia.
+DDL_INDICE_BUSCA = [
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS livros_fts USING fts5("
+        "titulo, autor, genero, content='livros', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_fts_ai AFTER INSERT ON livros BEGIN "
+        "INSERT INTO livros_fts(rowid, titulo, autor, genero) "
+        "VALUES (new.id, new.titulo, new.autor, new.genero); "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_fts_ad AFTER DELETE ON livros BEGIN "
+        "INSERT INTO livros_fts(livros_fts, rowid, titulo, autor, genero) "
+        "VALUES ('delete', old.id, old.titulo, old.autor, old.genero); "
+        "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_fts_au AFTER UPDATE OF titulo, autor, genero ON livros BEGIN "
+        "INSERT INTO livros_fts(livros_fts, rowid, titulo, autor, genero) "
+        "VALUES ('delete', old.id, old.titulo, old.autor, old.genero); "
+        "INSERT INTO livros_fts(rowid, titulo, autor, genero) "
+        "VALUES (new.id, new.titulo, new.autor, new.genero); "
+        "END"
+    ),
+]
+
+# Cria o índice junto com a tabela 'livros' (create_all) e o remove antes do drop
+for ddl in DDL_INDICE_BUSCA:
+    event.listen(Livro.__table__, "after_create", ddl.execute_if(dialect="sqlite"))
+event.listen(
+    Livro.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS livros_fts").execute_if(dialect="sqlite"),
+)
+
+# Instala o índice em um banco já existente, reconstruindo-o a partir das linhas atuais
+def instalar_indice_busca(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    existe = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livros_fts'")
+    ).first()
+    for ddl in DDL_INDICE_BUSCA:
+        conn.execute(ddl)
+    if not existe:
+        conn.execute(text("INSERT INTO livros_fts(livros_fts) VALUES ('rebuild')"))
@@ -10,8 +10,9 @@ class Categoria(Base):
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, unique=True, index=True)
 
-    # Relacionamento reverso com Livro (a tabela 'livros' possui a chave estrangeira categoria_id)
-    livros = relationship("Livro", back_populates="categoria")
+    # Relacionamento reverso com Livro (a tabela 'livros' possui a chave estrangeira categoria_id).
+    # passive_deletes: a exclusão dos livros fica com o banco (ON DELETE CASCADE), sem carregá-los na sessão
+    livros = relationship("Livro", back_populates="categoria", passive_deletes=True)
 
 # Classe Pydantic para criação de categoria
 class CategoriaCreate(BaseModel):
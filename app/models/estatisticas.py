@@ -0,0 +1,135 @@
+from sqlalchemy import Column, DDL, Integer, String, event, text
+from app.database import Base
+from app.models.livro import Livro
+
+# Contadores de livros mantidos pelo próprio banco (triggers em 'livros'), na mesma transação da escrita.
+# Valores ausentes são guardados como sentinelas para caberem na chave primária:
+# categoria_id 0 = sem categoria, genero '' = sem gênero, decada -1 = sem ano.
+class EstatisticaCategoria(Base):
+    __tablename__ = "estatisticas_categorias"
+
+    categoria_id = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+
+class EstatisticaGenero(Base):
+    __tablename__ = "estatisticas_generos"
+
+    genero = Column(String, primary_key=True)
+    decada = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+
+_CHAVE_CATEGORIA = "COALESCE({0}.categoria_id, 0)"
+_CHAVE_GENERO = "COALESCE({0}.genero, '')"
+_CHAVE_DECADA = "COALESCE({0}.ano / 10 * 10, -1)"
+
+def _incrementar_sqlite(linha: str) -> str:
+    return (
+        f"INSERT INTO estatisticas_categorias (categoria_id, total) VALUES ({_CHAVE_CATEGORIA.format(linha)}, 1) "
+        "ON CONFLICT (categoria_id) DO UPDATE SET total = total + 1; "
+        f"INSERT INTO estatisticas_generos (genero, decada, total) "
+        f"VALUES ({_CHAVE_GENERO.format(linha)}, {_CHAVE_DECADA.format(linha)}, 1) "
+        "ON CONFLICT (genero, decada) DO UPDATE SET total = total + 1; "
+    )
+
+def _decrementar(linha: str) -> str:
+    categoria = f"categoria_id = {_CHAVE_CATEGORIA.format(linha)}"
+    genero = f"genero = {_CHAVE_GENERO.format(linha)} AND decada = {_CHAVE_DECADA.format(linha)}"
+    return (
+        f"UPDATE estatisticas_categorias SET total = total - 1 WHERE {categoria}; "
+        f"DELETE FROM estatisticas_categorias WHERE {categoria} AND total <= 0; "
+        f"UPDATE estatisticas_generos SET total = total - 1 WHERE {genero}; "
+        f"DELETE FROM estatisticas_generos WHERE {genero} AND total <= 0; "
+    )
+
+DDL_ESTATISTICAS_SQLITE = [
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_estatisticas_ai AFTER INSERT ON livros BEGIN "
+        + _incrementar_sqlite("new")
+        + "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_estatisticas_ad AFTER DELETE ON livros BEGIN "
+        + _decrementar("old")
+        + "END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS livros_estatisticas_au AFTER UPDATE OF categoria_id, genero, ano ON livros "
+        "WHEN old.categoria_id IS NOT new.categoria_id OR old.genero IS NOT new.genero OR old.ano IS NOT new.ano "
+        "BEGIN "
+        + _decrementar("old")
+        + _incrementar_sqlite("new")
+        + "END"
+    ),
+]
+
+DDL_ESTATISTICAS_POSTGRESQL = [
+    DDL(
+        "CREATE OR REPLACE FUNCTION livros_estatisticas() RETURNS trigger AS $$ "
+        "BEGIN "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        + _decrementar("OLD")
+        + "END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        f"INSERT INTO estatisticas_categorias (categoria_id, total) VALUES ({_CHAVE_CATEGORIA.format('NEW')}, 1) "
+        "ON CONFLICT (categoria_id) DO UPDATE SET total = estatisticas_categorias.total + 1; "
+        f"INSERT INTO estatisticas_generos (genero, decada, total) "
+        f"VALUES ({_CHAVE_GENERO.format('NEW')}, {_CHAVE_DECADA.format('NEW')}, 1) "
+        "ON CONFLICT (genero, decada) DO UPDATE SET total = estatisticas_generos.total + 1; "
+        "END IF; "
+        "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    ),
+    DDL("DROP TRIGGER IF EXISTS livros_estatisticas ON livros"),
+    DDL(
+        "CREATE TRIGGER livros_estatisticas AFTER INSERT OR DELETE ON livros "
+        "FOR EACH ROW EXECUTE FUNCTION livros_estatisticas()"
+    ),
+    DDL("DROP TRIGGER IF EXISTS livros_estatisticas_au ON livros"),
+    DDL(
+        "CREATE TRIGGER livros_estatisticas_au AFTER UPDATE OF categoria_id, genero, ano ON livros "
+        "FOR EACH ROW WHEN (OLD.categoria_id IS DISTINCT FROM NEW.categoria_id "
+        "OR OLD.genero IS DISTINCT FROM NEW.genero OR OLD.ano IS DISTINCT FROM NEW.ano) "
+        "EXECUTE FUNCTION livros_estatisticas()"
+    ),
+]
+
+# Os triggers são criados junto com a tabela 'livros'
+for ddl in DDL_ESTATISTICAS_SQLITE:
+    event.listen(Livro.__table__, "after_create", ddl.execute_if(dialect="sqlite"))
+for ddl in DDL_ESTATISTICAS_POSTGRESQL:
+    event.listen(Livro.__table__, "after_create", ddl.execute_if(dialect="postgresql"))
+
+# Zera e recalcula todos os contadores a partir da tabela 'livros'
+def reconstruir_estatisticas(conn):
+    conn.execute(text("DELETE FROM estatisticas_categorias"))
+    conn.execute(text("DELETE FROM estatisticas_generos"))
+    conn.execute(text(
+        f"INSERT INTO estatisticas_categorias (categoria_id, total) "
+        f"SELECT {_CHAVE_CATEGORIA.format('livros')}, COUNT(*) FROM livros "
+        f"GROUP BY {_CHAVE_CATEGORIA.format('livros')}"
+    ))
+    conn.execute(text(
+        f"INSERT INTO estatisticas_generos (genero, decada, total) "
+        f"SELECT {_CHAVE_GENERO.format('livros')}, {_CHAVE_DECADA.format('livros')}, COUNT(*) FROM livros "
+        f"GROUP BY {_CHAVE_GENERO.format('livros')}, {_CHAVE_DECADA.format('livros')}"
+    ))
+
+# Instala os triggers em um banco já existente e recalcula os contadores na primeira instalação
+def instalar_estatisticas(conn):
+    if conn.dialect.name == "sqlite":
+        existe = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'livros_estatisticas_ai'")
+        ).first()
+        comandos = DDL_ESTATISTICAS_SQLITE
+    elif conn.dialect.name == "postgresql":
+        existe = conn.execute(
+            text("SELECT 1 FROM pg_trigger WHERE tgname = 'livros_estatisticas'")
+        ).first()
+        comandos = DDL_ESTATISTICAS_POSTGRESQL
+    else:
+        return
+    if existe:
+        return
+    for ddl in comandos:
+        conn.execute(ddl)
+    reconstruir_estatisticas(conn)
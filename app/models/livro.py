@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -6,16 +6,23 @@ from app.database import Base
 # Modelo Livro para o banco de dados
 class Livro(Base):
     __tablename__ = "livros"
+    # Índices compostos dos filtros facetados (genero, ano, categoria_id): toda combinação
+    # desses filtros tem um índice cujo prefixo são colunas filtradas por igualdade
+    __table_args__ = (
+        Index("ix_livros_genero_ano_categoria", "genero", "ano", "categoria_id"),
+        Index("ix_livros_ano_categoria", "ano", "categoria_id"),
+        Index("ix_livros_categoria_genero", "categoria_id", "genero"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String, index=True)
-    autor = Column(String)
+    autor = Column(String, index=True)
     ano = Column(Integer)
-    genero = Column(String)
+    genero = Column(String, index=True)  # Sozinho, devolve os livros do gênero já na ordem de id (paginação sem ordenar)
     categoria_id = Column(Integer, ForeignKey('categorias.id', ondelete='CASCADE'), nullable=True)  # Referência à tabela 'categorias' com CASCADE e nullable=True
 
     # Relacionamento com a tabela Categoria
-    categoria = relationship("Categoria", back_populates="livros", cascade="all, delete")  # CASCADE para deletar livros associados quando a categoria for deletada
+    categoria = relationship("Categoria", back_populates="livros")
 
     # Campos de Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)  # Definido na criação
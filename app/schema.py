@@ -0,0 +1,49 @@
+import logging
+from sqlalchemy import Column, Integer, select
+from sqlalchemy.exc import DBAPIError
+from app.database import Base
+from app.models.livro import Livro  # noqa: F401 (registra as tabelas no metadata)
+from app.models.categoria import Categoria  # noqa: F401
+from app.models.user import Usuario  # noqa: F401
+from app.models.busca import instalar_indice_busca
+from app.models.estatisticas import instalar_estatisticas
+from app.models.alteracoes import instalar_alteracoes
+
+logger = logging.getLogger(__name__)
+
+# Versão do schema esperada pelo código; incremente ao mudar tabelas, índices ou triggers
+SCHEMA_VERSAO = 7
+
+# Versão do schema já aplicada ao banco (uma única linha)
+class VersaoSchema(Base):
+    __tablename__ = "versao_schema"
+
+    versao = Column(Integer, primary_key=True, autoincrement=False)
+
+def versao_do_banco(engine):
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(VersaoSchema.versao)).scalar()
+    except DBAPIError:
+        return None  # Tabela ainda não existe
+
+# Cria as tabelas que faltam e instala os objetos auxiliares (índices de busca, triggers),
+# mas só quando a versão gravada no banco difere da esperada. Retorna True se algo foi aplicado.
+def inicializar_banco(engine) -> bool:
+    versao = versao_do_banco(engine)
+    if versao == SCHEMA_VERSAO:
+        return False
+
+    logger.info("Atualizando schema do banco da versão %s para %s.", versao, SCHEMA_VERSAO)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # create_all pula tabelas que já existem, inclusive os índices delas
+        for tabela in Base.metadata.sorted_tables:
+            for indice in tabela.indexes:
+                indice.create(conn, checkfirst=True)
+        instalar_indice_busca(conn)
+        instalar_estatisticas(conn)
+        instalar_alteracoes(conn)
+        conn.execute(VersaoSchema.__table__.delete())
+        conn.execute(VersaoSchema.__table__.insert().values(versao=SCHEMA_VERSAO))
+    return True
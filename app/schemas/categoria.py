@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Optional
+from pydantic import BaseModel, field_validator
 
 class CategoriaBase(BaseModel):
     nome: str
@@ -6,6 +7,17 @@ class CategoriaBase(BaseModel):
 class CategoriaCreate(CategoriaBase):
     pass
 
+# Atualização parcial (PATCH): só os campos enviados no corpo são alterados
+class CategoriaUpdate(BaseModel):
+    nome: Optional[str] = None
+
+    @field_validator("nome")
+    @classmethod
+    def _rejeitar_nulo(cls, valor):
+        if valor is None:
+            raise ValueError("não pode ser null")
+        return valor
+
 class Categoria(CategoriaBase):
     id: int
 
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Dict, Generic, List, Optional, TypeVar, Union
+from pydantic import BaseModel, ConfigDict, field_validator
+from app.models.categoria import CategoriaResponse
+
+# Dados de entrada de um livro (usado na importação em lote)
+class LivroCreate(BaseModel):
+    titulo: str
+    autor: str
+    ano: int
+    genero: str
+    categoria_id: Optional[int] = None
+
+# Atualização parcial (PATCH): só os campos enviados no corpo são alterados
+class LivroUpdate(BaseModel):
+    titulo: Optional[str] = None
+    autor: Optional[str] = None
+    ano: Optional[int] = None
+    genero: Optional[str] = None
+    categoria_id: Optional[int] = None  # null tira o livro da categoria
+
+    # Campos obrigatórios no PUT: podem ser omitidos, mas não enviados como null
+    @field_validator("titulo", "autor", "ano", "genero")
+    @classmethod
+    def _rejeitar_nulo(cls, valor):
+        if valor is None:
+            raise ValueError("não pode ser null")
+        return valor
+
+# Resposta de um livro (lida direto dos atributos do objeto SQLAlchemy)
+class LivroResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    titulo: Optional[str] = None
+    autor: Optional[str] = None
+    ano: Optional[int] = None
+    genero: Optional[str] = None
+    categoria_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# Livro com a categoria embutida (carregada antes com selectinload, sem lazy load na serialização)
+class LivroComCategoria(LivroResponse):
+    categoria: Optional[CategoriaResponse] = None
+
+T = TypeVar("T")
+
+# Página da listagem com o cursor da próxima página
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next: Optional[str] = None
+
+# Quantidade de livros com um valor de faceta (genero, ano ou categoria_id)
+class ValorFaceta(BaseModel):
+    valor: Optional[Union[int, str]] = None
+    total: int
+
+# Página da busca facetada: resultados e contagens por faceta para os mesmos filtros
+class PaginaFacetada(Pagina[LivroResponse]):
+    facetas: Dict[str, List[ValorFaceta]]
+
+# Uma entrada do feed de alterações: o livro atual, ou None quando a operação é uma exclusão ('D')
+class AlteracaoLivroResponse(BaseModel):
+    seq: int
+    id: int
+    operacao: str
+    alterado_em: Optional[datetime] = None
+    livro: Optional[LivroResponse] = None
+
+# Página do feed: next sempre traz o cursor para retomar (mesmo sem alterações novas)
+class PaginaAlteracoes(BaseModel):
+    items: List[AlteracaoLivroResponse]
+    next: str
+    tem_mais: bool
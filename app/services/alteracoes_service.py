@@ -0,0 +1,30 @@
+from sqlalchemy import literal_column, select, tuple_
+from sqlalchemy.orm import Session
+from app.models.alteracoes import HORIZONTE_POSTGRESQL, AlteracaoLivro
+from app.models.livro import Livro
+
+# Condições para ler o feed de `tabela` depois de `posicao` (xid, seq), em ordem de (xid, seq).
+# Com `horizonte`, no PostgreSQL só até o xmin do snapshot atual: o que está adiante pode ainda
+# ganhar alterações de transações abertas (ver HORIZONTE_POSTGRESQL). Sem ele, lê tudo o que já
+# está visível, para quem só quer as alterações da própria escrita e não guarda o cursor.
+def condicoes_depois_de(tabela, posicao, dialeto: str, horizonte: bool = True):
+    condicoes = [tuple_(tabela.xid, tabela.seq) > tuple_(*posicao)]
+    if horizonte and dialeto == "postgresql":
+        condicoes.append(tabela.xid < literal_column(HORIZONTE_POSTGRESQL))
+    return condicoes
+
+# Alterações depois da posição `desde`, em ordem, com o estado atual do livro (None nas lápides).
+# Busca uma alteração a mais para saber se o cliente ainda tem o que ler.
+def listar_alteracoes(db: Session, desde, limite: int):
+    consulta = (
+        select(
+            AlteracaoLivro.xid, AlteracaoLivro.seq, AlteracaoLivro.livro_id, AlteracaoLivro.operacao,
+            AlteracaoLivro.alterado_em, Livro,
+        )
+        .outerjoin(Livro, Livro.id == AlteracaoLivro.livro_id)
+        .where(*condicoes_depois_de(AlteracaoLivro, desde, db.get_bind().dialect.name))
+        .order_by(AlteracaoLivro.xid, AlteracaoLivro.seq)
+        .limit(limite + 1)
+    )
+    alteracoes = db.execute(consulta).all()
+    return alteracoes[:limite], len(alteracoes) > limite
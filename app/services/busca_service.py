@@ -0,0 +1,39 @@
+import re
+from sqlalchemy import or_, select, text
+from sqlalchemy.orm import Session
+from app.models.livro import Livro
+
+# Consulta FTS5 ordenada por relevância (bm25); 'rank' é a coluna de ranking da tabela virtual
+SQL_BUSCA_FTS = (
+    "SELECT {colunas} FROM livros_fts "
+    "JOIN livros ON livros.id = livros_fts.rowid "
+    "WHERE livros_fts MATCH :consulta "
+    "ORDER BY livros_fts.rank "
+    "LIMIT :limite"
+)
+BUSCA_FTS = text(SQL_BUSCA_FTS.format(colunas="livros.*"))
+
+# Separa o texto digitado em termos (letras e números, com acentos)
+def extrair_termos(q: str):
+    return re.findall(r"\w+", q or "")
+
+# Monta a expressão MATCH: cada termo vira um prefixo entre aspas, todos obrigatórios
+def montar_consulta_fts(termos) -> str:
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+# Com colunas (projeção de ?fields=), devolve dicionários só com elas em vez de objetos Livro
+def buscar_livros_texto(db: Session, termos, limite: int, colunas=None):
+    if db.get_bind().dialect.name == "sqlite":
+        parametros = {"consulta": montar_consulta_fts(termos), "limite": limite}
+        if colunas:
+            sql = SQL_BUSCA_FTS.format(colunas=", ".join(f"livros.{coluna.name}" for coluna in colunas))
+            return [dict(livro) for livro in db.execute(text(sql), parametros).mappings()]
+        return db.query(Livro).from_statement(BUSCA_FTS).params(**parametros).all()
+
+    # Outros bancos: cada termo precisa aparecer em algum dos campos
+    consulta = select(*colunas) if colunas else select(Livro)
+    for termo in termos:
+        padrao = f"%{termo}%"
+        consulta = consulta.where(or_(Livro.titulo.ilike(padrao), Livro.autor.ilike(padrao), Livro.genero.ilike(padrao)))
+    resultado = db.execute(consulta.order_by(Livro.id).limit(limite))
+    return [dict(livro) for livro in resultado.mappings()] if colunas else resultado.scalars().all()
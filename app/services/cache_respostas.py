@@ -0,0 +1,67 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+import orjson
+from fastapi import Request, Response
+from app.config import Settings
+from app.utils.cache import CacheLRU
+
+# Resposta já serializada, com a ETag e a categoria do livro (para invalidação por categoria)
+@dataclass(frozen=True)
+class RespostaEmCache:
+    corpo: bytes
+    etag: str
+    categoria_id: Optional[int] = None
+
+# Limites ajustados por create_app a partir das configurações
+cache_respostas = CacheLRU(tamanho_maximo=Settings.cache_respostas_tamanho, ttl=Settings.cache_respostas_ttl)
+
+CHAVE_CATEGORIAS = ("categorias",)
+
+def chave_livro(livro_id: int, incluir_categoria: bool = False):
+    return ("livro", livro_id, incluir_categoria)
+
+# Serializa como o ORJSONResponse (mesma saída das respostas sem cache)
+def serializar(conteudo) -> bytes:
+    return orjson.dumps(conteudo)
+
+# ETag forte de um livro: muda sempre que updated_at muda. Com a categoria embutida (corpo informado)
+# a resposta também muda quando a categoria é renomeada, sem tocar no livro: entra o hash do corpo.
+def etag_livro(livro, corpo: Optional[bytes] = None) -> str:
+    if corpo is not None:
+        return f'"livro-{livro.id}-c-{hashlib.sha1(corpo).hexdigest()}"'
+    versao = livro.updated_at or livro.created_at
+    return f'"livro-{livro.id}-{versao.timestamp() if versao else 0}"'
+
+# ETag forte derivada do próprio conteúdo (para listas sem updated_at)
+def etag_conteudo(corpo: bytes) -> str:
+    return f'"{hashlib.sha1(corpo).hexdigest()}"'
+
+def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatas = [valor.strip() for valor in if_none_match.split(",")]
+    return "*" in candidatas or etag in candidatas
+
+# Monta a resposta a partir da entrada em cache, respondendo 304 se o cliente já tem a versão atual
+def responder(request: Request, entrada: RespostaEmCache) -> Response:
+    headers = {"ETag": entrada.etag}
+    if _etag_confere(request.headers.get("if-none-match"), entrada.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entrada.corpo, media_type="application/json", headers=headers)
+
+def invalidar_livro(livro_id: int):
+    cache_respostas.remover(chave_livro(livro_id))
+    cache_respostas.remover(chave_livro(livro_id, incluir_categoria=True))
+
+def invalidar_livros_da_categoria(categoria_id: int):
+    cache_respostas.remover_se(
+        lambda chave, entrada: chave[0] == "livro" and entrada.categoria_id == categoria_id
+    )
+
+# Usado pelas operações em massa, que não sabem quais livros alteraram
+def invalidar_todos_livros():
+    cache_respostas.remover_se(lambda chave, entrada: chave[0] == "livro")
+
+def invalidar_categorias():
+    cache_respostas.remover(CHAVE_CATEGORIAS)
@@ -1,14 +1,80 @@
 from app.models.categoria import Categoria as CategoriaModel
+from app.models.estatisticas import EstatisticaCategoria, EstatisticaGenero
+from app.models.livro import Livro
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
 from app.schemas.categoria import CategoriaCreate
 
+# INSERT ... RETURNING: a categoria criada volta no mesmo comando, sem refresh
 def criar_categoria_service(db: Session, nome: str):
-    categoria = CategoriaModel(nome=nome)
-    db.add(categoria)
+    categoria = db.execute(insert(CategoriaModel).values(nome=nome).returning(*CategoriaModel.__table__.c)).mappings().one()
     db.commit()
-    db.refresh(categoria)
-    return categoria  # Retorna o objeto SQLAlchemy
+    return categoria
+
+# UPDATE ... RETURNING: uma ida ao banco; None se a categoria não existe
+def atualizar_categoria_service(db: Session, categoria_id: int, valores: dict):
+    categoria = db.execute(
+        update(CategoriaModel)
+        .where(CategoriaModel.id == categoria_id)
+        .values(**valores)
+        .returning(*CategoriaModel.__table__.c)
+        .execution_options(synchronize_session=False)
+    ).mappings().first()
+    db.commit()
+    return categoria
 
 def listar_categorias_service(db: Session):
     categorias = db.query(CategoriaModel).all()
     return categorias  # Retorna uma lista de objetos SQLAlchemy
+
+# Exclui a categoria e os livros dela com dois DELETEs na mesma transação, sem carregar os livros.
+# Os livros são removidos explicitamente (e não só pelo ON DELETE CASCADE) para devolver a contagem
+# e para funcionar também em bancos antigos criados sem a chave estrangeira.
+# Retorna o número de livros removidos, ou None se a categoria não existe.
+def deletar_categoria_service(db: Session, categoria_id: int):
+    livros_removidos = db.execute(
+        delete(Livro).where(Livro.categoria_id == categoria_id).execution_options(synchronize_session=False)
+    ).rowcount
+    categorias_removidas = db.execute(
+        delete(CategoriaModel).where(CategoriaModel.id == categoria_id).execution_options(synchronize_session=False)
+    ).rowcount
+    if not categorias_removidas:
+        db.rollback()
+        return None
+    db.commit()
+    return livros_removidos
+
+# Move todos os livros de uma categoria para outra (ou para nenhuma, com destino None) em um único UPDATE
+def reatribuir_livros_service(db: Session, origem_id: int, destino_id: int = None) -> int:
+    resultado = db.execute(
+        update(Livro)
+        .where(Livro.categoria_id == origem_id)
+        .values(categoria_id=destino_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
+
+# Lê os contadores já agregados: o custo depende do número de categorias/gêneros, não de livros
+def listar_estatisticas_service(db: Session):
+    categorias = (
+        db.query(EstatisticaCategoria.categoria_id, CategoriaModel.nome, EstatisticaCategoria.total)
+        .outerjoin(CategoriaModel, CategoriaModel.id == EstatisticaCategoria.categoria_id)
+        .order_by(EstatisticaCategoria.categoria_id)
+        .all()
+    )
+    generos = (
+        db.query(EstatisticaGenero.genero, EstatisticaGenero.decada, EstatisticaGenero.total)
+        .order_by(EstatisticaGenero.genero, EstatisticaGenero.decada)
+        .all()
+    )
+    return {
+        "categorias": [
+            {"categoria_id": categoria_id or None, "nome": nome, "total": total}
+            for categoria_id, nome, total in categorias
+        ],
+        "generos": [
+            {"genero": genero or None, "decada": None if decada == -1 else decada, "total": total}
+            for genero, decada, total in generos
+        ],
+    }
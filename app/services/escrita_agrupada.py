@@ -0,0 +1,133 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+from app import database
+from app.utils.metricas import registro_metricas
+
+logger = logging.getLogger(__name__)
+
+# Group commit: as escritas concorrentes entram numa fila e uma thread escritora grava várias
+# delas numa única transação (um fsync e uma aquisição do lock de escrita do SQLite por lote).
+# Cada operação roda no seu próprio SAVEPOINT, então o erro de uma não derruba as demais, e cada
+# chamador recebe o próprio resultado ou exceção.
+class EscritorAgrupado:
+    def __init__(self, ativo: bool = False, janela_ms: float = 2.0, lote_maximo: int = 64):
+        self.ativo = ativo
+        self.janela_ms = janela_ms  # Tempo máximo esperando outras escritas após a primeira do lote
+        self.lote_maximo = lote_maximo
+        self.lotes = 0
+        self.operacoes = 0
+        self._fila: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # Aplica as configurações; a thread escritora é criada no próximo uso
+    def configurar(self, ativo: bool, janela_ms: float, lote_maximo: int):
+        self.encerrar()
+        self.ativo = ativo
+        self.janela_ms = janela_ms
+        self.lote_maximo = lote_maximo
+        if ativo:
+            registro_metricas.adicionar_coletor(self._metricas)
+
+    # Enfileira a operação (função que recebe a conexão da transação) e espera o lote ser gravado
+    def executar(self, operacao: Callable):
+        futuro = Future()
+        self._obter_fila().put((operacao, futuro))
+        return futuro.result()
+
+    def _obter_fila(self) -> queue.Queue:
+        with self._lock:
+            if self._thread is None:
+                self._fila = queue.Queue()
+                self._thread = threading.Thread(target=self._executar_lotes, args=(self._fila,), name="escritor-agrupado", daemon=True)
+                self._thread.start()
+            return self._fila
+
+    # Grava o que ainda está na fila e para a thread escritora
+    def encerrar(self):
+        with self._lock:
+            thread, fila = self._thread, self._fila
+            self._thread = self._fila = None
+        if thread is not None:
+            fila.put(None)
+            thread.join()
+
+    def _executar_lotes(self, fila: queue.Queue):
+        while True:
+            item = fila.get()
+            if item is None:
+                return
+            lote = [item]
+            prazo = time.monotonic() + self.janela_ms / 1000
+            while len(lote) < self.lote_maximo:
+                restante = prazo - time.monotonic()
+                try:
+                    item = fila.get(timeout=restante) if restante > 0 else fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._gravar(lote)
+                    return
+                lote.append(item)
+            self._gravar(lote)
+
+    def _gravar(self, lote: List[Tuple[Callable, Future]]):
+        resultados = []
+        try:
+            with database.engine_lotes.begin() as conn:
+                for operacao, futuro in lote:
+                    try:
+                        with conn.begin_nested():
+                            resultados.append((futuro, operacao(conn), None))
+                    except Exception as erro:
+                        resultados.append((futuro, None, erro))
+        except Exception:
+            # Falha da transação inteira (ex.: banco travado no commit): cada operação tenta sozinha
+            logger.warning("Falha ao gravar lote de %s escritas; gravando uma a uma.", len(lote), exc_info=True)
+            self._gravar_individualmente(lote)
+            return
+
+        self.lotes += 1
+        self.operacoes += len(lote)
+        for futuro, resultado, erro in resultados:
+            if erro is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(erro)
+
+    def _gravar_individualmente(self, lote: List[Tuple[Callable, Future]]):
+        for operacao, futuro in lote:
+            try:
+                with database.engine_lotes.begin() as conn:
+                    resultado = operacao(conn)
+            except Exception as erro:
+                futuro.set_exception(erro)
+            else:
+                self.lotes += 1
+                self.operacoes += 1
+                futuro.set_result(resultado)
+
+    def _metricas(self):
+        return [
+            "# HELP group_commit_batches_total Transações gravadas pelo escritor agrupado.",
+            "# TYPE group_commit_batches_total counter",
+            f"group_commit_batches_total {self.lotes}",
+            "# HELP group_commit_operations_total Escritas gravadas pelo escritor agrupado.",
+            "# TYPE group_commit_operations_total counter",
+            f"group_commit_operations_total {self.operacoes}",
+        ]
+
+escritor_agrupado = EscritorAgrupado()
+
+# A thread escritora não existe no filho de um fork; ele cria a sua no primeiro uso
+def _esquecer_thread_herdada():
+    escritor_agrupado._thread = escritor_agrupado._fila = None
+    escritor_agrupado._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_esquecer_thread_herdada)
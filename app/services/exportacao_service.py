@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import select
+from app.database import SessionLeitura
+from app.models.livro import Livro
+
+# Quantidade de linhas buscadas do banco (e enviadas ao cliente) por vez
+LINHAS_POR_LOTE = 1000
+
+COLUNAS_EXPORTACAO = [coluna.name for coluna in Livro.__table__.columns]
+
+def _valor_texto(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+# Percorre o catálogo em lotes; stream_results usa cursor do lado do servidor no Postgres
+def _lotes_de_livros(atualizado_desde: Optional[datetime]) -> Iterator[list]:
+    consulta = select(Livro.__table__).order_by(Livro.id)
+    if atualizado_desde is not None:
+        consulta = consulta.where(Livro.updated_at >= atualizado_desde)
+    with SessionLeitura() as db:
+        resultado = db.execute(
+            consulta.execution_options(stream_results=True, yield_per=LINHAS_POR_LOTE)
+        )
+        for lote in resultado.mappings().partitions():
+            yield lote
+
+def exportar_ndjson(atualizado_desde: Optional[datetime] = None) -> Iterator[str]:
+    for lote in _lotes_de_livros(atualizado_desde):
+        yield "".join(
+            json.dumps({coluna: _valor_texto(linha[coluna]) for coluna in COLUNAS_EXPORTACAO}, ensure_ascii=False) + "\n"
+            for linha in lote
+        )
+
+def exportar_csv(atualizado_desde: Optional[datetime] = None) -> Iterator[str]:
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    yield saida.getvalue()
+    for lote in _lotes_de_livros(atualizado_desde):
+        saida.seek(0)
+        saida.truncate()
+        escritor.writerows([_valor_texto(linha[coluna]) for coluna in COLUNAS_EXPORTACAO] for linha in lote)
+        yield saida.getvalue()
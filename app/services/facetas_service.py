@@ -0,0 +1,32 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.livro import Livro
+
+# Colunas com contagem por valor; os filtros facetados são de igualdade para usarem os índices compostos
+COLUNAS_FACETAS = {"genero": Livro.genero, "ano": Livro.ano, "categoria_id": Livro.categoria_id}
+FILTROS_FACETADOS = ("genero", "ano", "categoria_id", "autor")
+VALORES_POR_FACETA = 100  # Limite de valores devolvidos em cada faceta (os mais frequentes)
+
+def condicoes_facetadas(**filtros):
+    return [getattr(Livro, campo) == valor for campo, valor in filtros.items() if valor is not None]
+
+# Com colunas (projeção de ?fields=), seleciona só elas em vez da entidade inteira
+def consulta_pagina(condicoes, ultimo_id: int = None, limite: int = 50, colunas=None):
+    consulta = (select(*colunas) if colunas else select(Livro)).where(*condicoes)
+    if ultimo_id is not None:
+        consulta = consulta.where(Livro.id > ultimo_id)
+    # Busca um registro a mais para saber se existe próxima página
+    return consulta.order_by(Livro.id).limit(limite + 1)
+
+def consultas_facetas(condicoes):
+    total = func.count().label("total")
+    return {
+        nome: select(coluna, total).where(*condicoes).group_by(coluna).order_by(total.desc(), coluna).limit(VALORES_POR_FACETA)
+        for nome, coluna in COLUNAS_FACETAS.items()
+    }
+
+def contar_facetas(db: Session, condicoes):
+    return {
+        nome: [{"valor": valor, "total": total} for valor, total in db.execute(consulta)]
+        for nome, consulta in consultas_facetas(condicoes).items()
+    }
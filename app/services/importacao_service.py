@@ -0,0 +1,115 @@
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.models.livro import Livro
+from app.schemas.livro import LivroCreate
+
+# Limites que mantêm a memória da importação constante, independente do tamanho do arquivo
+TAMANHO_MAXIMO_LINHA = 64 * 1024
+MAXIMO_ERROS_REPORTADOS = 100
+
+class LinhaMuitoLonga(Exception):
+    pass
+
+# Quebra o corpo da requisição em linhas à medida que os bytes chegam
+async def ler_linhas(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for pedaco in stream:
+        buffer += pedaco
+        *linhas, buffer = buffer.split(b"\n")
+        for linha in linhas:
+            yield linha.decode("utf-8", errors="replace").rstrip("\r")
+        if len(buffer) > TAMANHO_MAXIMO_LINHA:
+            raise LinhaMuitoLonga()
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+# Converte cada linha NDJSON em um dicionário (ou erro), numerando a partir de 1
+async def registros_ndjson(linhas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except json.JSONDecodeError as erro:
+            yield numero, erro
+
+# Converte linhas CSV (com cabeçalho) em dicionários; campos entre aspas podem conter quebras de linha
+async def registros_csv(linhas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    cabecalho = None
+    pendente = ""
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        pendente = f"{pendente}\n{linha}" if pendente else linha
+        if pendente.count('"') % 2:
+            if len(pendente) > TAMANHO_MAXIMO_LINHA:
+                raise LinhaMuitoLonga()
+            continue
+        texto, pendente = pendente, ""
+        if not texto.strip():
+            continue
+        campos = next(csv.reader([texto]))
+        if cabecalho is None:
+            cabecalho = [campo.strip() for campo in campos]
+            continue
+        if len(campos) != len(cabecalho):
+            yield numero, ValueError(f"esperado {len(cabecalho)} campos, recebido {len(campos)}")
+            continue
+        yield numero, {chave: (valor if valor != "" else None) for chave, valor in zip(cabecalho, campos)}
+
+# Valida um registro bruto, devolvendo os valores para inserção ou a mensagem de erro
+def validar_registro(registro) -> Tuple[Dict, str]:
+    if isinstance(registro, Exception):
+        return None, str(registro)
+    if not isinstance(registro, dict):
+        return None, "registro deve ser um objeto"
+    try:
+        return LivroCreate.model_validate(registro).model_dump(), None
+    except ValidationError as erro:
+        primeiro = erro.errors()[0]
+        campo = ".".join(str(parte) for parte in primeiro["loc"])
+        return None, f"{campo}: {primeiro['msg']}"
+
+# Insere um lote com um único INSERT executemany; se o lote falhar, insere linha a linha
+# para isolar os registros com problema sem perder os demais
+def inserir_lote(db: Session, lote: List[Tuple[int, Dict]]) -> Tuple[List, List[Tuple[int, str]]]:
+    # RETURNING devolve (id, titulo, autor) dos livros criados, para o índice de sugestões
+    comando = insert(Livro).returning(Livro.id, Livro.titulo, Livro.autor)
+    try:
+        criados = db.execute(comando, [valores for _, valores in lote]).all()
+        db.commit()
+        return criados, []
+    except SQLAlchemyError:
+        db.rollback()
+
+    criados, erros = [], []
+    for numero, valores in lote:
+        try:
+            criados.extend(db.execute(comando, [valores]).all())
+            db.commit()
+        except SQLAlchemyError as erro:
+            db.rollback()
+            erros.append((numero, str(erro.orig) if getattr(erro, "orig", None) else str(erro)))
+    return criados, erros
+
+# Acumula o resultado da importação guardando só os primeiros erros
+class ResultadoImportacao:
+    def __init__(self):
+        self.inseridos = 0
+        self.com_erro = 0
+        self.erros = []
+
+    def registrar_erro(self, numero: int, mensagem: str):
+        self.com_erro += 1
+        if len(self.erros) < MAXIMO_ERROS_REPORTADOS:
+            self.erros.append({"linha": numero, "erro": mensagem})
+
+    def como_dict(self):
+        return {"inseridos": self.inseridos, "com_erro": self.com_erro, "erros": self.erros}
@@ -0,0 +1,69 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from app.models.livro import Livro
+from app.services.escrita_agrupada import escritor_agrupado
+
+CAMPOS_LIVRO = tuple(coluna.name for coluna in Livro.__table__.c)
+
+# Colunas pedidas em ?fields= (na ordem da tabela e sempre com o id), para o SELECT ler só elas;
+# None quando o parâmetro não foi informado (resposta completa)
+def colunas_projetadas(fields: Optional[str]):
+    if fields is None:
+        return None
+    pedidos = {campo.strip() for campo in fields.split(",") if campo.strip()}
+    desconhecidos = pedidos - set(CAMPOS_LIVRO)
+    if desconhecidos:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(sorted(desconhecidos))}")
+    return [coluna for coluna in Livro.__table__.c if coluna.name == "id" or coluna.name in pedidos]
+
+# Condições dos filtros de livros (mesma semântica da listagem: texto parcial, sem distinção de caixa)
+def condicoes_filtro(titulo: str = None, autor: str = None, ano: int = None, genero: str = None, categoria_id: int = None):
+    condicoes = []
+    if titulo and titulo.strip():
+        condicoes.append(Livro.titulo.ilike(f"%{titulo.strip()}%"))
+    if autor and autor.strip():
+        condicoes.append(Livro.autor.ilike(f"%{autor.strip()}%"))
+    if ano:
+        condicoes.append(Livro.ano == ano)
+    if genero and genero.strip():
+        condicoes.append(Livro.genero.ilike(f"%{genero.strip()}%"))
+    if categoria_id is not None:
+        condicoes.append(Livro.categoria_id == categoria_id)
+    return condicoes
+
+# Um único DELETE no banco: nenhum livro é carregado na sessão, a memória não depende de quantos são removidos
+def deletar_livros_service(db: Session, condicoes) -> int:
+    resultado = db.execute(
+        delete(Livro).where(*condicoes).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
+
+# Executa o comando na sessão da requisição ou, com a escrita agrupada ligada, no lote do escritor
+def _gravar(db: Session, comando, uma_linha: bool):
+    def executar(conexao):
+        resultado = conexao.execute(comando).mappings()
+        return resultado.one() if uma_linha else resultado.first()
+
+    if escritor_agrupado.ativo:
+        return escritor_agrupado.executar(executar)
+    livro = executar(db)
+    db.commit()
+    return livro
+
+# INSERT ... RETURNING: o livro criado (com id e timestamps) volta no mesmo comando, sem refresh
+def criar_livro_service(db: Session, valores: dict):
+    return _gravar(db, insert(Livro).values(**valores).returning(*Livro.__table__.c), uma_linha=True)
+
+# UPDATE ... RETURNING: uma ida ao banco; None se nenhuma linha foi afetada (livro inexistente)
+def atualizar_livro_service(db: Session, livro_id: int, valores: dict):
+    comando = (
+        update(Livro)
+        .where(Livro.id == livro_id)
+        .values(**valores)
+        .returning(*Livro.__table__.c)
+        .execution_options(synchronize_session=False)
+    )
+    return _gravar(db, comando, uma_linha=False)
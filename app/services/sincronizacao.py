@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import threading
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, literal_column, select
+from app.models.alteracoes import HORIZONTE_POSTGRESQL, AlteracaoCategoria, AlteracaoLivro, AlteracaoUsuario
+from app.models.livro import Livro
+from app.services.alteracoes_service import condicoes_depois_de
+from app.services.cache_respostas import invalidar_categorias, invalidar_livro, invalidar_livros_da_categoria
+from app.services.sugestoes import indice_sugestoes
+from app.utils.auth import invalidar_usuario_por_id
+
+logger = logging.getLogger(__name__)
+
+LOTE_SINCRONIZACAO = 1000
+
+# Uma aplicação por vez: leitura e aplicação de um lote não se intercalam com as de outro lote
+_lock_aplicacao = threading.Lock()
+
+# Posição (xid, seq) a partir da qual o feed só traz alterações ainda por vir. No PostgreSQL é o
+# horizonte: tudo abaixo dele já está visível, e o que for gravado daqui em diante fica acima.
+def posicao_atual(engine, tabela=AlteracaoLivro):
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            return conn.execute(select(literal_column(HORIZONTE_POSTGRESQL))).scalar(), 0
+        return 0, conn.execute(select(func.max(tabela.seq))).scalar() or 0
+
+# Aplica no cache de respostas e no índice de sugestões até LOTE_SINCRONIZACAO alterações depois
+# da posição `desde`. Retorna quantas foram aplicadas e a última posição vista.
+def _aplicar_lote(engine, desde, horizonte: bool = True):
+    consulta = (
+        select(AlteracaoLivro.xid, AlteracaoLivro.seq, AlteracaoLivro.livro_id, AlteracaoLivro.operacao, Livro.titulo, Livro.autor)
+        .outerjoin(Livro, Livro.id == AlteracaoLivro.livro_id)
+        .where(*condicoes_depois_de(AlteracaoLivro, desde, engine.dialect.name, horizonte))
+        .order_by(AlteracaoLivro.xid, AlteracaoLivro.seq)
+        .limit(LOTE_SINCRONIZACAO)
+    )
+    with _lock_aplicacao:
+        with engine.connect() as conn:
+            alteracoes = conn.execute(consulta).all()
+        for xid, seq, livro_id, operacao, titulo, autor in alteracoes:
+            invalidar_livro(livro_id)
+            if operacao == "D":
+                indice_sugestoes.remover(livro_id)
+            else:
+                indice_sugestoes.atualizar(livro_id, titulo, autor)
+            desde = (xid, seq)
+    return len(alteracoes), desde
+
+# Tira do cache de autenticação os usuários alterados ou removidos depois da posição `desde`
+def _aplicar_lote_usuarios(engine, desde):
+    consulta = (
+        select(AlteracaoUsuario.xid, AlteracaoUsuario.seq, AlteracaoUsuario.usuario_id)
+        .where(*condicoes_depois_de(AlteracaoUsuario, desde, engine.dialect.name))
+        .order_by(AlteracaoUsuario.xid, AlteracaoUsuario.seq)
+        .limit(LOTE_SINCRONIZACAO)
+    )
+    with _lock_aplicacao:
+        with engine.connect() as conn:
+            alteracoes = conn.execute(consulta).all()
+        for xid, seq, usuario_id in alteracoes:
+            invalidar_usuario_por_id(usuario_id)
+            desde = (xid, seq)
+    return len(alteracoes), desde
+
+# Tira do cache de respostas a lista de categorias e os livros das categorias criadas, alteradas ou
+# removidas depois da posição `desde` (a categoria vai embutida em GET /livros/{id}?incluir_categoria)
+def _aplicar_lote_categorias(engine, desde):
+    consulta = (
+        select(AlteracaoCategoria.xid, AlteracaoCategoria.seq, AlteracaoCategoria.categoria_id)
+        .where(*condicoes_depois_de(AlteracaoCategoria, desde, engine.dialect.name))
+        .order_by(AlteracaoCategoria.xid, AlteracaoCategoria.seq)
+        .limit(LOTE_SINCRONIZACAO)
+    )
+    with _lock_aplicacao:
+        with engine.connect() as conn:
+            alteracoes = conn.execute(consulta).all()
+        if alteracoes:
+            invalidar_categorias()
+        for xid, seq, categoria_id in alteracoes:
+            invalidar_livros_da_categoria(categoria_id)
+            desde = (xid, seq)
+    return len(alteracoes), desde
+
+# Aplica todas as alterações posteriores à posição `desde`, lote a lote: usada depois das exclusões
+# em massa, que não carregam os livros removidos (a memória não depende de quantos são). Lê além do
+# horizonte: a escrita que acabou de ser confirmada pode estar acima dele enquanto houver uma
+# transação mais antiga aberta, e o cursor não é guardado.
+def aplicar_alteracoes(engine, desde):
+    aplicadas = LOTE_SINCRONIZACAO
+    while aplicadas == LOTE_SINCRONIZACAO:
+        aplicadas, desde = _aplicar_lote(engine, desde, horizonte=False)
+    return desde
+
+# Com vários processos, cada um tem seu cache de respostas, seu índice de sugestões e seu cache de
+# autenticação, e uma escrita só os atualiza no processo que a atendeu. Cada processo acompanha então
+# os feeds de alterações (alteracoes_livros, alteracoes_usuarios e alteracoes_categorias) e aplica
+# nos seus caches as escritas feitas pelos outros.
+class SincronizadorAlteracoes:
+    def __init__(self):
+        self.posicao = (0, 0)
+        self.posicao_usuarios = (0, 0)
+        self.posicao_categorias = (0, 0)
+
+    # Começa do fim dos feeds: o que veio antes já está no índice construído na partida
+    def posicionar(self, engine):
+        self.posicao = posicao_atual(engine)
+        self.posicao_usuarios = posicao_atual(engine, AlteracaoUsuario)
+        self.posicao_categorias = posicao_atual(engine, AlteracaoCategoria)
+
+    # Aplica até um lote de cada feed; retorna o maior número de alterações aplicadas de um deles
+    def aplicar(self, engine) -> int:
+        aplicadas, self.posicao = _aplicar_lote(engine, self.posicao)
+        aplicadas_usuarios, self.posicao_usuarios = _aplicar_lote_usuarios(engine, self.posicao_usuarios)
+        aplicadas_categorias, self.posicao_categorias = _aplicar_lote_categorias(engine, self.posicao_categorias)
+        return max(aplicadas, aplicadas_usuarios, aplicadas_categorias)
+
+    async def executar_periodicamente(self, engine, intervalo_s: float):
+        while True:
+            await asyncio.sleep(intervalo_s)
+            try:
+                while await run_in_threadpool(self.aplicar, engine) == LOTE_SINCRONIZACAO:
+                    pass
+            except Exception:
+                logger.warning("Falha ao aplicar o feed de alterações.", exc_info=True)
+
+sincronizador_alteracoes = SincronizadorAlteracoes()
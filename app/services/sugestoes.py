@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app.models.livro import Livro
+
+SUGESTOES_PADRAO = 10
+SUGESTOES_MAXIMO = 50
+# Prefixos que casam com mais chaves que isto têm o ranking guardado e atualizado a cada escrita;
+# os demais são ordenados na hora (no máximo LIMIAR_RANKING chaves percorridas)
+LIMIAR_RANKING = 256
+# Itens guardados por ranking: a folga acima de SUGESTOES_MAXIMO absorve os que perdem usos e saem
+CAPACIDADE_RANKING = 2 * SUGESTOES_MAXIMO
+_FIM = chr(0x10FFFF)  # Maior caractere: (prefixo + _FIM) vem depois de toda chave com o prefixo
+
+# Forma usada para comparar: sem acentos e sem distinção de caixa ("Érico" -> "erico")
+def normalizar(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere)).casefold().strip()
+
+# Chaves de um texto: o texto inteiro e cada sufixo que começa numa palavra,
+# para "casm" sugerir "Dom Casmurro" além dos títulos que começam por "casm"
+def _chaves(texto: str) -> List[str]:
+    normalizado = normalizar(texto)
+    palavras = normalizado.split()
+    return [" ".join(palavras[inicio:]) for inicio in range(len(palavras))]
+
+# Entradas de um ranking: (-usos, chave, tipo, texto), em ordem crescente = mais usados primeiro,
+# empates pela chave que casou (ordem alfabética)
+def _calcular_ranking(chaves, usos, prefixo: str, inicio: int, fim: int, capacidade: int):
+    candidatos = {}
+    for chave, tipo, texto in chaves[inicio:fim]:
+        if (tipo, texto) not in candidatos:  # A primeira chave do item é a menor que casa
+            candidatos[(tipo, texto)] = (-usos[(tipo, texto)], chave, tipo, texto)
+    return heapq.nsmallest(capacidade, candidatos.values())
+
+def _faixa(chaves, prefixo: str) -> Tuple[int, int]:
+    return bisect.bisect_left(chaves, (prefixo,)), bisect.bisect_left(chaves, (prefixo + _FIM,))
+
+# Ranking guardado de um prefixo. Truncado quando há mais itens casando do que os guardados:
+# quem está fora nunca supera o último guardado, então a lista continua sendo o topo correto.
+class _Ranking:
+    __slots__ = ("entradas", "truncado")
+
+    def __init__(self, entradas, truncado: bool):
+        self.entradas = entradas
+        self.truncado = truncado
+
+    def valido(self) -> bool:
+        return not self.truncado or len(self.entradas) >= SUGESTOES_MAXIMO
+
+    # Ajusta o ranking à nova contagem de um item (0 = saiu do índice)
+    def ajustar(self, tipo: str, texto: str, usos: int, chave: str):
+        anterior = None
+        for posicao, entrada in enumerate(self.entradas):
+            if entrada[2] == tipo and entrada[3] == texto:
+                anterior = self.entradas.pop(posicao)
+                break
+        if usos <= 0:
+            return
+        nova = (-usos, chave, tipo, texto)
+        if self.truncado and (not self.entradas or nova > self.entradas[-1]):
+            # Depois do último guardado: algum item de fora pode estar à frente dele. Só continua
+            # se subiu (estava guardado e ganhou usos), pois então ainda supera todos os de fora.
+            if anterior is None or nova > anterior:
+                return
+        bisect.insort(self.entradas, nova)
+        if len(self.entradas) > CAPACIDADE_RANKING:
+            self.entradas.pop()
+            self.truncado = True
+
+# Índice de prefixos de títulos e autores em memória. As chaves ficam numa lista ordenada
+# (busca por prefixo com bisect); cada texto guarda quantos livros o usam, para sair do
+# índice só quando o último livro com ele for removido e para ordenar as sugestões.
+# Os prefixos que casam com muitas chaves (como "s") mantêm o ranking pronto, atualizado a cada
+# mudança de contagem, então nenhuma consulta percorre mais que LIMIAR_RANKING chaves.
+class IndiceSugestoes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chaves: List[Tuple[str, str, str]] = []  # (chave normalizada, tipo, texto original)
+        self._usos: Counter = Counter()  # (tipo, texto) -> número de livros
+        self._livros: Dict[int, Tuple[Optional[str], Optional[str]]] = {}  # id -> (titulo, autor)
+        self._rankings: Dict[str, _Ranking] = {}  # prefixo -> ranking guardado
+
+    def __len__(self):
+        return len(self._livros)
+
+    # Reconstrói o índice lendo só id, titulo e autor de todos os livros (em lotes)
+    def construir(self, engine):
+        livros = {}
+        with engine.connect() as conn:
+            resultado = conn.execution_options(stream_results=True, yield_per=1000).execute(
+                select(Livro.id, Livro.titulo, Livro.autor)
+            )
+            for livro_id, titulo, autor in resultado:
+                livros[livro_id] = (titulo, autor)
+
+        usos = Counter()
+        for titulo, autor in livros.values():
+            for item in self._itens(titulo, autor):
+                usos[item] += 1
+        chaves = sorted((chave, tipo, texto) for tipo, texto in usos for chave in _chaves(texto))
+        rankings = self._construir_rankings(chaves, usos)
+        with self._lock:
+            self._livros, self._usos, self._chaves, self._rankings = livros, usos, chaves, rankings
+
+    # Rankings de todos os prefixos com mais de LIMIAR_RANKING chaves, das folhas para a raiz: o topo de
+    # um prefixo sai da junção dos topos dos filhos (a melhor chave de cada item cai num só filho, e
+    # quem está à frente dele lá também está no prefixo pai), sem percorrer as chaves de novo
+    @classmethod
+    def _construir_rankings(cls, chaves, usos) -> Dict[str, _Ranking]:
+        rankings = {}
+        cls._ranking_do_prefixo(chaves, usos, "", 0, len(chaves), rankings)
+        rankings.pop("", None)
+        return rankings
+
+    @classmethod
+    def _ranking_do_prefixo(cls, chaves, usos, prefixo: str, inicio: int, fim: int, rankings) -> _Ranking:
+        candidatos = {}
+        truncado = False
+        posicao = inicio
+        while posicao < fim:
+            chave = chaves[posicao][0]
+            if len(chave) <= len(prefixo):
+                fim_filho = posicao + 1  # A chave é o próprio prefixo
+                entradas = _calcular_ranking(chaves, usos, chave, posicao, fim_filho, CAPACIDADE_RANKING)
+            else:
+                filho = chave[: len(prefixo) + 1]
+                fim_filho = bisect.bisect_left(chaves, (filho + _FIM,), posicao, fim)
+                if fim_filho - posicao > LIMIAR_RANKING:
+                    ranking = cls._ranking_do_prefixo(chaves, usos, filho, posicao, fim_filho, rankings)
+                    entradas, truncado = ranking.entradas, truncado or ranking.truncado
+                else:
+                    entradas = _calcular_ranking(chaves, usos, filho, posicao, fim_filho, CAPACIDADE_RANKING + 1)
+            for entrada in entradas:
+                item = entrada[2:]
+                if item not in candidatos or entrada < candidatos[item]:
+                    candidatos[item] = entrada
+            posicao = fim_filho
+        entradas = heapq.nsmallest(CAPACIDADE_RANKING + 1, candidatos.values())
+        ranking = _Ranking(entradas[:CAPACIDADE_RANKING], truncado or len(entradas) > CAPACIDADE_RANKING)
+        rankings[prefixo] = ranking
+        return ranking
+
+    def limpar(self):
+        with self._lock:
+            self._livros, self._usos, self._chaves, self._rankings = {}, Counter(), [], {}
+
+    @staticmethod
+    def _itens(titulo: Optional[str], autor: Optional[str]):
+        if titulo and titulo.strip():
+            yield ("titulo", titulo.strip())
+        if autor and autor.strip():
+            yield ("autor", autor.strip())
+
+    def _incluir(self, item):
+        self._usos[item] += 1
+        tipo, texto = item
+        if self._usos[item] == 1:
+            for chave in _chaves(texto):
+                bisect.insort(self._chaves, (chave, tipo, texto))
+        self._ajustar_rankings(item)
+
+    def _excluir(self, item):
+        self._usos[item] -= 1
+        if self._usos[item] <= 0:
+            del self._usos[item]
+            tipo, texto = item
+            for chave in _chaves(texto):
+                posicao = bisect.bisect_left(self._chaves, (chave, tipo, texto))
+                if posicao < len(self._chaves) and self._chaves[posicao] == (chave, tipo, texto):
+                    del self._chaves[posicao]
+        self._ajustar_rankings(item)
+
+    # Leva a nova contagem do item aos rankings guardados dos prefixos das suas chaves
+    def _ajustar_rankings(self, item):
+        tipo, texto = item
+        usos = self._usos.get(item, 0)
+        chaves = sorted(_chaves(texto))
+        vistos = set()
+        for chave in chaves:
+            for tamanho in range(1, len(chave) + 1):
+                prefixo = chave[:tamanho]
+                if prefixo in vistos:
+                    continue
+                vistos.add(prefixo)
+                ranking = self._rankings.get(prefixo)
+                if ranking is not None:
+                    # chaves está em ordem: a primeira que casa é a usada no desempate
+                    ranking.ajustar(tipo, texto, usos, chave)
+
+    # Criação e atualização: troca o título/autor anterior do livro (se houver) pelos novos
+    def atualizar(self, livro_id: int, titulo: Optional[str], autor: Optional[str]):
+        with self._lock:
+            anterior = self._livros.get(livro_id)
+            if anterior == (titulo, autor):
+                return
+            if anterior is not None:
+                for item in self._itens(*anterior):
+                    self._excluir(item)
+            self._livros[livro_id] = (titulo, autor)
+            for item in self._itens(titulo, autor):
+                self._incluir(item)
+
+    def remover(self, livro_id: int):
+        with self._lock:
+            anterior = self._livros.pop(livro_id, None)
+            if anterior is not None:
+                for item in self._itens(*anterior):
+                    self._excluir(item)
+
+    # Os `limite` textos mais usados (em número de livros) cujo título/autor, ou uma de suas palavras,
+    # começa com o prefixo; empates ficam em ordem alfabética
+    def sugerir(self, prefixo: str, limite: int = SUGESTOES_PADRAO):
+        prefixo = " ".join(normalizar(prefixo).split())
+        if not prefixo:
+            return []
+        with self._lock:
+            ranking = self._rankings.get(prefixo)
+            if ranking is not None and ranking.valido():
+                entradas = ranking.entradas[:limite]
+            else:
+                inicio, fim = _faixa(self._chaves, prefixo)
+                if fim - inicio <= LIMIAR_RANKING:
+                    entradas = _calcular_ranking(self._chaves, self._usos, prefixo, inicio, fim, limite)
+                else:
+                    # Prefixo que passou a casar com muitas chaves, ou ranking esvaziado por exclusões
+                    entradas = _calcular_ranking(self._chaves, self._usos, prefixo, inicio, fim, CAPACIDADE_RANKING + 1)
+                    self._rankings[prefixo] = _Ranking(entradas[:CAPACIDADE_RANKING], len(entradas) > CAPACIDADE_RANKING)
+                    entradas = entradas[:limite]
+        return [{"texto": texto, "tipo": tipo} for _, _, tipo, texto in entradas]
+
+indice_sugestoes = IndiceSugestoes()
@@ -0,0 +1,114 @@
+import logging
+import os
+import signal
+import socket
+import time
+from dataclasses import replace
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Os limites de DB_POOL_SIZE, DB_MAX_OVERFLOW e HASH_WORKERS valem para a máquina inteira e são
+# divididos entre os workers; com mais de um worker, os caches passam a seguir o feed de alterações
+def configuracoes_por_worker(settings: Settings, workers: int) -> Settings:
+    return replace(
+        settings,
+        db_pool_size=max(1, settings.db_pool_size // workers),
+        db_max_overflow=max(0, settings.db_max_overflow // workers),
+        hash_workers=max(1, settings.hash_workers // workers),
+        sincronizacao_intervalo_s=settings.sincronizacao_intervalo_s or (1.0 if workers > 1 else 0),
+    )
+
+# O socket é aberto pelo processo principal e herdado pelos workers, que aceitam conexões nele
+def criar_socket(host: str, porta: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _executar_worker(settings: Settings, sock: socket.socket, tempo_encerramento: int):
+    import uvicorn
+    from app.main import create_app
+
+    # Fora do grupo do processo principal: o Ctrl+C do terminal chega só a ele, que repassa um SIGTERM
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # create_app recria os engines neste processo (os do pai foram descartados no fork).
+    # No SIGTERM o uvicorn para de aceitar conexões e espera as requisições em andamento.
+    config = uvicorn.Config(
+        create_app(settings),
+        lifespan="on",
+        timeout_graceful_shutdown=tempo_encerramento,
+        log_config=None,
+        access_log=False,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _iniciar_worker(settings: Settings, sock: socket.socket, tempo_encerramento: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        codigo = 0
+        try:
+            _executar_worker(settings, sock, tempo_encerramento)
+        except BaseException:
+            logger.exception("Worker %s encerrado com erro.", os.getpid())
+            codigo = 1
+        finally:
+            os._exit(codigo)
+    return pid
+
+# Servidor pre-fork: o processo principal prepara o banco, abre o socket e mantém `workers` processos
+# atendendo; no SIGTERM/SIGINT repassa o sinal e espera o encerramento gracioso de cada worker
+def servir(settings: Settings, host: str, porta: int, workers: int, tempo_encerramento: int = 30):
+    if not hasattr(os, "fork"):
+        raise RuntimeError("O comando serve precisa de os.fork (Linux ou macOS); use uvicorn app.main:app.")
+
+    from app import database
+    from app.schema import inicializar_banco
+    from app.utils.logs import configurar_logs, encerrar_logs
+    import app.main  # noqa: F401 (importado uma vez aqui; os workers herdam os módulos já carregados)
+
+    configurar_logs(settings.log_nivel, settings.log_fila_tamanho, settings.log_taxa_amostragem)
+    # Schema aplicado uma única vez, antes dos workers existirem
+    database.configurar_banco(settings)
+    inicializar_banco(database.engine)
+    database.encerrar_banco()
+
+    sock = criar_socket(host, porta)
+    por_worker = configuracoes_por_worker(settings, workers)
+    filhos = {_iniciar_worker(por_worker, sock, tempo_encerramento) for _ in range(workers)}
+    logger.info("Servindo em %s:%s com %s worker(s).", host, porta, workers)
+
+    prazo = None
+    def parar(sinal, frame):
+        nonlocal prazo
+        if prazo is None:
+            logger.info("Encerrando os workers.")
+            prazo = time.monotonic() + tempo_encerramento + 5
+            for pid in filhos:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+    try:
+        while filhos:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if prazo is not None and time.monotonic() > prazo:
+                    for restante in filhos:
+                        os.kill(restante, signal.SIGKILL)
+                time.sleep(0.1)
+                continue
+            filhos.discard(pid)
+            if prazo is None:
+                logger.warning("Worker %s terminou (código %s); iniciando outro.", pid, os.waitstatus_to_exitcode(status))
+                filhos.add(_iniciar_worker(por_worker, sock, tempo_encerramento))
+    finally:
+        sock.close()
+        encerrar_logs()
@@ -1,20 +1,29 @@
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app
-from app.database import SessionLocal, engine, Base
+from app import database
+from app.config import carregar_configuracoes
+from app.main import create_app
+from app.database import Base
 from app.models.livro import Livro
 from app.models.categoria import Categoria
 from app.models.user import Usuario
+from app.utils.auth import cache_usuarios, criar_acesso_token
+from app.services.cache_respostas import cache_respostas
+from app.services.sugestoes import indice_sugestoes
+
+# Banco descartável para não alterar o livros.db e custo mínimo do bcrypt para os testes rodarem rápido
+settings = carregar_configuracoes(database_url="sqlite:///./test_livros.db", bcrypt_rounds=4)
+app = create_app(settings)
 
 # Fixture para criar um banco de dados de teste
 @pytest.fixture(scope="module")
 def db():
     # Cria o banco de dados em memória para os testes
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
+    Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
     yield db
     db.close()
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=database.engine)
 
 # Fixture para o cliente HTTP
 @pytest.fixture()
@@ -25,8 +34,26 @@ def client():
 # Fixture para criar um usuário de teste
 @pytest.fixture()
 def create_user(db):
+    # Reaproveita o usuário se ele já foi criado por outro teste do módulo
+    usuario = db.query(Usuario).filter(Usuario.nome_usuario == "test_user").first()
+    if usuario:
+        return usuario
     usuario = Usuario(nome_usuario="test_user", senha_hash="test_password")
     db.add(usuario)
     db.commit()
     db.refresh(usuario)
     return usuario
+
+# Fixture com um token JWT válido para o usuário de teste
+@pytest.fixture()
+def auth_headers(create_user):
+    token = criar_acesso_token(data={"sub": create_user.nome_usuario})
+    return {"Authorization": f"Bearer {token}"}
+
+# Os caches em memória não podem vazar entre testes (o banco é recriado a cada módulo)
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    cache_respostas.limpar()
+    cache_usuarios.limpar()
+    indice_sugestoes.limpar()
+    yield
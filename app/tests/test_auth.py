@@ -1,26 +1,81 @@
+import threading
 import pytest
+from sqlalchemy import event
+from app import database
+from app.models.user import Usuario
+from app.utils import hash_senha
+from app.utils.auth import criar_acesso_token
+from app.utils.hash_senha import criar_contexto
 
-def test_register(client):
-    response = client.post("/register", json={"nome_usuario": "test_user", "senha": "test_password"})
+def test_register(client, db):
+    response = client.post("/register", params={"nome_usuario": "test_register_user", "senha": "test_password"})
     assert response.status_code == 200
     assert "Usuário registrado com sucesso" in response.json()["message"]
 
-def test_login(client):
+def test_login(client, db):
     # Registrar o usuário primeiro
-    client.post("/register", json={"nome_usuario": "test_user", "senha": "test_password"})
+    client.post("/register", params={"nome_usuario": "test_login_user", "senha": "test_password"})
     
-    # Tentar logar com as credenciais
+    # Tentar logar com as credenciais (formulário OAuth2)
     response = client.post(
         "/login",
-        json={"nome_usuario": "test_user", "senha": "test_password"},
+        data={"username": "test_login_user", "password": "test_password"},
     )
     assert response.status_code == 200
     assert "access_token" in response.json()
 
-def test_login_invalid(client):
+def test_login_invalid(client, db):
     # Tentar logar com credenciais inválidas
     response = client.post(
         "/login",
-        json={"nome_usuario": "invalid_user", "senha": "invalid_password"},
+        data={"username": "invalid_user", "password": "invalid_password"},
     )
     assert response.status_code == 401
+
+def test_usuario_autenticado_em_cache(client, db):
+    usuario = Usuario(nome_usuario="usuario_cache", senha_hash="hash")
+    db.add(usuario)
+    db.commit()
+    headers = {"Authorization": f"Bearer {criar_acesso_token(data={'sub': 'usuario_cache'})}"}
+
+    consultas = []
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if "FROM usuarios" in statement:
+            consultas.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", contar)
+    try:
+        assert client.post("/livros/bulk", content=b"", headers=headers).status_code == 200
+        assert client.post("/livros/bulk", content=b"", headers=headers).status_code == 200
+    finally:
+        event.remove(database.engine, "before_cursor_execute", contar)
+    assert len(consultas) == 1
+
+    # Remover o usuário invalida o cache e o token deixa de valer
+    db.delete(usuario)
+    db.commit()
+    assert client.post("/livros/bulk", content=b"", headers=headers).status_code == 401
+
+def test_login_refaz_hash_quando_custo_muda(client, db, monkeypatch):
+    senha_hash = criar_contexto(4).hash("senha_antiga")
+    db.add(Usuario(nome_usuario="usuario_rehash", senha_hash=senha_hash))
+    db.commit()
+
+    monkeypatch.setattr(hash_senha.pool_hash, "rounds", 5)
+    response = client.post("/login", data={"username": "usuario_rehash", "password": "senha_antiga"})
+    assert response.status_code == 200
+    assert "access_token" in response.json()
+
+    db.expire_all()
+    usuario = db.query(Usuario).filter(Usuario.nome_usuario == "usuario_rehash").first()
+    assert usuario.senha_hash.startswith("$2b$05$")
+
+def test_login_recusado_com_fila_cheia(client, db, monkeypatch):
+    monkeypatch.setattr(hash_senha.pool_hash, "_vagas", threading.BoundedSemaphore(1))
+    hash_senha.pool_hash._vagas.acquire()
+    db.add(Usuario(nome_usuario="usuario_fila", senha_hash=criar_contexto(4).hash("senha")))
+    db.commit()
+
+    response = client.post("/login", data={"username": "usuario_fila", "password": "senha"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,126 @@
+from app import database
+from app.models.categoria import Categoria
+from app.models.estatisticas import reconstruir_estatisticas
+from app.models.livro import Livro
+
+def test_listar_categorias_etag(client, db, auth_headers):
+    response = client.post("/categorias/", params={"nome": "Categoria ETag"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get("/categorias/")
+    assert response.status_code == 200
+    assert "Categoria ETag" in [categoria["nome"] for categoria in response.json()]
+    etag = response.headers["ETag"]
+
+    response = client.get("/categorias/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Renomear a categoria invalida a listagem em cache
+    categoria_id = db.query(Categoria).filter(Categoria.nome == "Categoria ETag").first().id
+    response = client.put(f"/categorias/{categoria_id}", params={"nome": "Categoria ETag 2"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get("/categorias/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Categoria ETag 2" in [categoria["nome"] for categoria in response.json()]
+
+def test_atualizar_categoria_parcial(client, db, auth_headers):
+    response = client.post("/categorias/", params={"nome": "Categoria Parcial"}, headers=auth_headers)
+    assert response.status_code == 200
+    categoria_id = response.json()["id"]
+
+    response = client.patch(f"/categorias/{categoria_id}", json={"nome": "Categoria Parcial 2"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"id": categoria_id, "nome": "Categoria Parcial 2"}
+    assert client.patch("/categorias/999999", json={"nome": "X"}, headers=auth_headers).status_code == 404
+    assert client.patch(f"/categorias/{categoria_id}", json={"nome": None}, headers=auth_headers).status_code == 422
+
+    # Nome repetido: 409 na criação, no PUT e no PATCH
+    assert client.post("/categorias/", params={"nome": "Categoria Parcial 2"}, headers=auth_headers).status_code == 409
+    outra_id = client.post("/categorias/", params={"nome": "Categoria Parcial 3"}, headers=auth_headers).json()["id"]
+    assert client.put(f"/categorias/{outra_id}", params={"nome": "Categoria Parcial 2"}, headers=auth_headers).status_code == 409
+    assert client.patch(f"/categorias/{outra_id}", json={"nome": "Categoria Parcial 2"}, headers=auth_headers).status_code == 409
+    assert client.get("/categorias/").status_code == 200  # A sessão segue utilizável
+
+def _estatisticas(client):
+    response = client.get("/categorias/stats")
+    assert response.status_code == 200
+    return response.json()
+
+def _total_categoria(estatisticas, categoria_id):
+    for item in estatisticas["categorias"]:
+        if item["categoria_id"] == categoria_id:
+            return item["total"]
+    return 0
+
+def test_estatisticas_incrementais(client, db):
+    categoria = Categoria(nome="Categoria Stats")
+    db.add(categoria)
+    db.commit()
+
+    livros = [
+        Livro(titulo="Stats 1", autor="Autor", ano=1985, genero="Stats", categoria_id=categoria.id),
+        Livro(titulo="Stats 2", autor="Autor", ano=1989, genero="Stats", categoria_id=categoria.id),
+        Livro(titulo="Stats 3", autor="Autor", ano=1992, genero="Stats", categoria_id=None),
+    ]
+    db.add_all(livros)
+    db.commit()
+
+    estatisticas = _estatisticas(client)
+    assert _total_categoria(estatisticas, categoria.id) == 2
+    decadas = {item["decada"]: item["total"] for item in estatisticas["generos"] if item["genero"] == "Stats"}
+    assert decadas == {1980: 2, 1990: 1}
+
+    # Mover um livro de categoria e de década e excluir outro
+    livros[0].categoria_id = None
+    livros[0].ano = 1991
+    db.commit()
+    db.delete(livros[1])
+    db.commit()
+
+    estatisticas = _estatisticas(client)
+    assert _total_categoria(estatisticas, categoria.id) == 0
+    decadas = {item["decada"]: item["total"] for item in estatisticas["generos"] if item["genero"] == "Stats"}
+    assert decadas == {1990: 2}
+
+    # Reconstruir do zero chega aos mesmos números
+    with database.engine.begin() as conn:
+        reconstruir_estatisticas(conn)
+    assert _estatisticas(client) == estatisticas
+
+def _criar_categoria_com_livros(db, nome, quantidade):
+    categoria = Categoria(nome=nome)
+    db.add(categoria)
+    db.commit()
+    db.add_all([
+        Livro(titulo=f"{nome} {i}", autor="Autor Massa", ano=2000, genero="Massa", categoria_id=categoria.id)
+        for i in range(quantidade)
+    ])
+    db.commit()
+    return categoria.id
+
+def test_reatribuir_livros(client, db, auth_headers):
+    origem = _criar_categoria_com_livros(db, "Categoria Origem", 3)
+    destino = _criar_categoria_com_livros(db, "Categoria Destino", 1)
+
+    response = client.post(f"/categorias/{origem}/reatribuir", params={"destino": destino}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"livros_atualizados": 3}
+    assert db.query(Livro).filter(Livro.categoria_id == destino).count() == 4
+    assert _total_categoria(_estatisticas(client), destino) == 4
+
+    response = client.post(f"/categorias/{origem}/reatribuir", params={"destino": 999999}, headers=auth_headers)
+    assert response.status_code == 404
+
+def test_deletar_categoria_remove_livros(client, db, auth_headers):
+    categoria_id = _criar_categoria_com_livros(db, "Categoria Excluída", 5)
+    livro_id = db.query(Livro.id).filter(Livro.categoria_id == categoria_id).first().id
+    assert client.get(f"/livros/{livro_id}").status_code == 200  # Fica em cache
+
+    response = client.delete(f"/categorias/{categoria_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["livros_removidos"] == 5
+    assert db.query(Livro).filter(Livro.categoria_id == categoria_id).count() == 0
+    assert client.get(f"/livros/{livro_id}").status_code == 404
+
+    assert client.delete(f"/categorias/{categoria_id}", headers=auth_headers).status_code == 404
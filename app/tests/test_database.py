@@ -0,0 +1,135 @@
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+import pytest
+from fastapi.testclient import TestClient
+from app import database, schema
+from app.database import SessionLeitura, SessionLocal, get_db
+from app.main import create_app
+from app.schema import SCHEMA_VERSAO, inicializar_banco, versao_do_banco
+from app.servidor import configuracoes_por_worker
+from app.services.cache_respostas import CHAVE_CATEGORIAS, RespostaEmCache, cache_respostas, chave_livro
+from app.services.sincronizacao import SincronizadorAlteracoes
+from app.services.sugestoes import indice_sugestoes
+from app.config import carregar_configuracoes
+from app.tests.conftest import settings
+from app.utils.auth import UsuarioAutenticado, cache_usuarios
+from app.utils.paginacao import codificar_cursor, decodificar_posicao
+
+class RequisicaoFalsa:
+    def __init__(self, method):
+        self.method = method
+
+def test_pragmas_sqlite(db):
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+def test_engine_leitura_somente_leitura(db):
+    with database.engine_leitura.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM livros"))
+
+def test_pre_ping_desligado_por_padrao():
+    assert database.engine.pool._pre_ping is False
+    engine = database.criar_engine("sqlite:///./test_livros.db", carregar_configuracoes(db_pool_pre_ping=True))
+    assert engine.pool._pre_ping is True
+    engine.dispose()
+
+def test_get_db_roteia_por_metodo():
+    for metodo, fabrica in [("GET", SessionLeitura), ("POST", SessionLocal), ("DELETE", SessionLocal)]:
+        gerador = get_db(RequisicaoFalsa(metodo))
+        sessao = next(gerador)
+        assert sessao.get_bind() is fabrica.kw["bind"]
+        gerador.close()
+
+def test_inicializar_banco_so_aplica_quando_versao_muda(db, monkeypatch):
+    assert inicializar_banco(database.engine) is True  # O fixture db cria as tabelas sem gravar a versão
+    assert versao_do_banco(database.engine) == SCHEMA_VERSAO
+    assert inicializar_banco(database.engine) is False
+
+    monkeypatch.setattr(schema, "SCHEMA_VERSAO", SCHEMA_VERSAO + 1)
+    assert inicializar_banco(database.engine) is True
+    assert versao_do_banco(database.engine) == SCHEMA_VERSAO + 1
+
+def test_lifespan_inicializa_banco(db):
+    with TestClient(create_app(settings)) as client:
+        assert client.get("/").status_code == 200
+    assert versao_do_banco(database.engine) == schema.SCHEMA_VERSAO
+
+def test_configuracoes_por_worker_dividem_os_limites():
+    por_worker = configuracoes_por_worker(settings, 4)
+    assert por_worker.db_pool_size == max(1, settings.db_pool_size // 4)
+    assert por_worker.db_max_overflow == settings.db_max_overflow // 4
+    assert por_worker.hash_workers == max(1, settings.hash_workers // 4)
+    assert por_worker.sincronizacao_intervalo_s == 1.0
+    assert configuracoes_por_worker(settings, 1).sincronizacao_intervalo_s == settings.sincronizacao_intervalo_s
+
+def test_sincronizador_aplica_escritas_de_outro_processo(db):
+    sincronizador = SincronizadorAlteracoes()
+    sincronizador.posicionar(database.engine)
+    # Escritas feitas direto no banco, como se outro worker as tivesse atendido
+    with database.engine.begin() as conn:
+        livro_id = conn.execute(text("INSERT INTO livros (titulo, autor) VALUES ('Sagarana', 'Guimarães Rosa') RETURNING id")).scalar()
+    assert sincronizador.aplicar(database.engine) == 1
+    assert indice_sugestoes.sugerir("saga") == [{"texto": "Sagarana", "tipo": "titulo"}]
+
+    with database.engine.begin() as conn:
+        conn.execute(text("DELETE FROM livros WHERE id = :id"), {"id": livro_id})
+    assert sincronizador.aplicar(database.engine) == 1
+    assert indice_sugestoes.sugerir("saga") == []
+    assert sincronizador.aplicar(database.engine) == 0
+
+def test_sincronizador_invalida_usuarios_alterados_em_outro_processo(db):
+    sincronizador = SincronizadorAlteracoes()
+    sincronizador.posicionar(database.engine)
+    with database.engine.begin() as conn:
+        usuario_id = conn.execute(text("INSERT INTO usuarios (nome_usuario, senha_hash) VALUES ('sinc', 'x') RETURNING id")).scalar()
+    cache_usuarios.definir("token-sinc", UsuarioAutenticado(id=usuario_id, nome_usuario="sinc"))
+    assert sincronizador.aplicar(database.engine) == 0  # Criações não tiram ninguém do cache
+
+    # Removido direto no banco, como se outro worker tivesse atendido a exclusão
+    with database.engine.begin() as conn:
+        conn.execute(text("DELETE FROM usuarios WHERE id = :id"), {"id": usuario_id})
+    assert cache_usuarios.obter("token-sinc") is not None
+    assert sincronizador.aplicar(database.engine) == 1
+    assert cache_usuarios.obter("token-sinc") is None
+
+def test_feed_segue_a_ordem_de_xid_e_seq(client, db):
+    # Como no PostgreSQL: a transação mais antiga (xid menor) confirma depois, com um seq maior
+    with database.engine.begin() as conn:
+        conn.execute(text("DELETE FROM alteracoes_livros"))
+        conn.execute(text("INSERT INTO alteracoes_livros (seq, livro_id, operacao, xid) VALUES (10, 1, 'I', 20), (11, 2, 'I', 7)"))
+    try:
+        pagina = client.get("/livros/changes", params={"limite": 1}).json()
+        assert [item["seq"] for item in pagina["items"]] == [11]
+        pagina = client.get("/livros/changes", params={"since": pagina["next"]}).json()
+        assert [item["seq"] for item in pagina["items"]] == [10]
+        assert decodificar_posicao(pagina["next"]) == (20, 10)
+    finally:
+        with database.engine.begin() as conn:
+            conn.execute(text("DELETE FROM alteracoes_livros"))
+    # Cursores de seq emitidos antes da posição continuam valendo
+    assert decodificar_posicao(codificar_cursor(10)) == (0, 10)
+
+def test_sincronizador_invalida_categorias_alteradas_em_outro_processo(db):
+    sincronizador = SincronizadorAlteracoes()
+    sincronizador.posicionar(database.engine)
+    with database.engine.begin() as conn:
+        categoria_id = conn.execute(text("INSERT INTO categorias (nome) VALUES ('Sinc') RETURNING id")).scalar()
+    cache_respostas.definir(CHAVE_CATEGORIAS, RespostaEmCache(b"[]", '"lista"'))
+    cache_respostas.definir(chave_livro(1, True), RespostaEmCache(b"{}", '"livro"', categoria_id))
+    cache_respostas.definir(chave_livro(2, True), RespostaEmCache(b"{}", '"outro"', categoria_id + 1))
+    assert sincronizador.aplicar(database.engine) == 1
+    assert cache_respostas.obter(CHAVE_CATEGORIAS) is None  # A lista já não tem a categoria criada
+
+    # Renomeada direto no banco: sai a lista e os livros servidos com ela embutida
+    cache_respostas.definir(CHAVE_CATEGORIAS, RespostaEmCache(b"[]", '"lista"'))
+    with database.engine.begin() as conn:
+        conn.execute(text("UPDATE categorias SET nome = 'Sinc 2' WHERE id = :id"), {"id": categoria_id})
+    assert sincronizador.aplicar(database.engine) == 1
+    assert cache_respostas.obter(CHAVE_CATEGORIAS) is None
+    assert cache_respostas.obter(chave_livro(1, True)) is None
+    assert cache_respostas.obter(chave_livro(2, True)) is not None
+    assert sincronizador.aplicar(database.engine) == 0
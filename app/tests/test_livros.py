@@ -1,13 +1,24 @@
+import json
+import threading
 import pytest
+from sqlalchemy import event
 from fastapi import HTTPException
+from app import database
+from app.models.categoria import Categoria
 from app.models.livro import Livro
+from app.services.cache_respostas import cache_respostas, chave_livro, invalidar_livro
+from app.services.escrita_agrupada import escritor_agrupado
+from app.services import sincronizacao
+from app.services.sugestoes import IndiceSugestoes, indice_sugestoes
+from app.utils.compressao import configuracao_compressao
+from benchmarks.plano_consultas import verificar_planos
 
-def test_criar_livro(client, db, create_user):
+def test_criar_livro(client, db, auth_headers):
     # Criar livro
     response = client.post(
         "/livros/",
-        json={"titulo": "Livro Teste", "autor": "Autor Teste", "ano": 2024, "genero": "Ficção"},
-        headers={"Authorization": "Bearer dummy_token"},  # Substitua com um token válido
+        params={"titulo": "Livro Teste", "autor": "Autor Teste", "ano": 2024, "genero": "Ficção"},
+        headers=auth_headers,
     )
     assert response.status_code == 201
     assert "titulo" in response.json()
@@ -17,7 +28,40 @@ def test_listar_livros(client, db, create_user):
     # Listar livros
     response = client.get("/livros/")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+
+def test_listar_livros_paginado(client, db):
+    # Criar livros suficientes para mais de uma página
+    for i in range(5):
+        db.add(Livro(titulo=f"Livro Paginado {i}", autor="Autor Paginado", ano=2000 + i, genero="Ficção"))
+    db.commit()
+
+    # Percorrer todas as páginas seguindo o cursor
+    ids = []
+    cursor = None
+    while True:
+        params = {"autor": "Autor Paginado", "limite": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/livros/", params=params)
+        assert response.status_code == 200
+        pagina = response.json()
+        assert len(pagina["items"]) <= 2
+        ids.extend(livro["id"] for livro in pagina["items"])
+        cursor = pagina["next"]
+        if not cursor:
+            break
+
+    assert len(ids) == 5
+    assert ids == sorted(ids)
+
+def test_listar_livros_cursor_invalido(client):
+    response = client.get("/livros/", params={"cursor": "!!invalido!!"})
+    assert response.status_code == 400
+
+def test_listar_livros_limite_maximo(client):
+    response = client.get("/livros/", params={"limite": 100000})
+    assert response.status_code == 422
 
 def test_buscar_livro(client, db, create_user):
     # Criar um livro no banco de dados
@@ -31,7 +75,7 @@ def test_buscar_livro(client, db, create_user):
     assert response.status_code == 200
     assert response.json()["titulo"] == "Livro de Teste"
 
-def test_atualizar_livro(client, db, create_user):
+def test_atualizar_livro(client, db, auth_headers):
     # Criar livro
     novo_livro = Livro(titulo="Livro para Atualizar", autor="Autor Teste", ano=2024, genero="Ficção")
     db.add(novo_livro)
@@ -41,13 +85,41 @@ def test_atualizar_livro(client, db, create_user):
     # Atualizar livro
     response = client.put(
         f"/livros/{novo_livro.id}",
-        json={"titulo": "Livro Atualizado", "autor": "Autor Teste", "ano": 2024, "genero": "Aventura"},
-        headers={"Authorization": "Bearer dummy_token"},  # Substitua com um token válido
+        params={"titulo": "Livro Atualizado", "autor": "Autor Teste", "ano": 2024, "genero": "Aventura"},
+        headers=auth_headers,
     )
     assert response.status_code == 200
     assert response.json()["titulo"] == "Livro Atualizado"
 
-def test_deletar_livro(client, db, create_user):
+def test_atualizar_livro_parcial(client, db, auth_headers):
+    novo_livro = Livro(titulo="Livro Parcial", autor="Autor Parcial", ano=2000, genero="Ficção")
+    db.add(novo_livro)
+    db.commit()
+
+    # Só o UPDATE ... RETURNING vai ao banco (o usuário já está em cache após a primeira requisição)
+    assert client.patch(f"/livros/{novo_livro.id}", json={"ano": 2001}, headers=auth_headers).status_code == 200
+    comandos = []
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", contar)
+    try:
+        response = client.patch(f"/livros/{novo_livro.id}", json={"genero": "Aventura"}, headers=auth_headers)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", contar)
+    assert response.status_code == 200
+    assert response.json()["genero"] == "Aventura"
+    assert response.json()["ano"] == 2001
+    assert response.json()["titulo"] == "Livro Parcial"
+    assert len(comandos) == 1 and comandos[0].startswith("UPDATE livros")
+
+    assert client.patch("/livros/999999", json={"ano": 2001}, headers=auth_headers).status_code == 404
+    assert client.patch(f"/livros/{novo_livro.id}", json={}, headers=auth_headers).status_code == 400
+    assert client.patch(f"/livros/{novo_livro.id}", json={"titulo": None}, headers=auth_headers).status_code == 422
+    assert client.patch(f"/livros/{novo_livro.id}", json={"categoria_id": 999999}, headers=auth_headers).status_code == 404
+    assert client.get(f"/livros/{novo_livro.id}").json()["titulo"] == "Livro Parcial"
+
+def test_deletar_livro(client, db, auth_headers):
     # Criar livro
     novo_livro = Livro(titulo="Livro para Deletar", autor="Autor Teste", ano=2024, genero="Ficção")
     db.add(novo_livro)
@@ -55,6 +127,453 @@ def test_deletar_livro(client, db, create_user):
     db.refresh(novo_livro)
 
     # Deletar livro
-    response = client.delete(f"/livros/{novo_livro.id}", headers={"Authorization": "Bearer dummy_token"})
+    response = client.delete(f"/livros/{novo_livro.id}", headers=auth_headers)
     assert response.status_code == 200
     assert response.json() == {"message": "Livro deletado com sucesso"}
+
+def test_deletar_livros_por_filtro(client, db, auth_headers, monkeypatch):
+    db.add_all([Livro(titulo=f"Descarte {i}", autor="Autor Descarte", ano=1950, genero="Ficção") for i in range(4)])
+    db.add(Livro(titulo="Mantido", autor="Autor Descarte", ano=1960, genero="Ficção"))
+    db.commit()
+    indice_sugestoes.construir(database.engine)
+    monkeypatch.setattr(sincronizacao, "LOTE_SINCRONIZACAO", 3)  # As lápides são lidas em mais de um lote
+
+    # Sem filtro a exclusão em massa é recusada
+    assert client.delete("/livros/", headers=auth_headers).status_code == 400
+
+    # Curingas do LIKE não valem: os filtros são de igualdade
+    for curinga in ("%", "_", "Descarte"):
+        response = client.delete("/livros/", params={"titulo": curinga}, headers=auth_headers)
+        assert response.json() == {"livros_removidos": 0}
+    assert client.delete("/livros/", params={"autor": "autor descarte"}, headers=auth_headers).json() == {"livros_removidos": 0}
+
+    response = client.delete("/livros/", params={"autor": "Autor Descarte", "ano": 1950}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"livros_removidos": 4}
+    assert db.query(Livro).filter(Livro.autor == "Autor Descarte").count() == 1
+    # Os livros removidos saem do índice de sugestões; o autor continua, pelo livro mantido
+    assert indice_sugestoes.sugerir("descarte") == [{"texto": "Autor Descarte", "tipo": "autor"}]
+
+def test_buscar_livros_texto(client, db):
+    db.add(Livro(titulo="Memórias Póstumas de Brás Cubas", autor="Machado de Assis", ano=1881, genero="Romance"))
+    db.add(Livro(titulo="Dom Casmurro", autor="Machado de Assis", ano=1899, genero="Romance"))
+    db.commit()
+
+    # Casamento por prefixo e sem acentos
+    response = client.get("/livros/busca", params={"q": "memorias brá"})
+    assert response.status_code == 200
+    titulos = [livro["titulo"] for livro in response.json()["items"]]
+    assert titulos == ["Memórias Póstumas de Brás Cubas"]
+
+    response = client.get("/livros/busca", params={"q": "machad"})
+    assert len(response.json()["items"]) == 2
+
+def test_buscar_livros_texto_sincronizado(client, db):
+    livro = Livro(titulo="Quincas Borba", autor="Machado de Assis", ano=1891, genero="Romance")
+    db.add(livro)
+    db.commit()
+
+    # Atualização e exclusão refletem no índice
+    livro.titulo = "Helena"
+    db.commit()
+    assert client.get("/livros/busca", params={"q": "quincas"}).json()["items"] == []
+    assert len(client.get("/livros/busca", params={"q": "helena"}).json()["items"]) == 1
+
+    db.delete(livro)
+    db.commit()
+    assert client.get("/livros/busca", params={"q": "helena"}).json()["items"] == []
+
+def test_buscar_livros_texto_sem_termos(client):
+    response = client.get("/livros/busca", params={"q": "  "})
+    assert response.status_code == 400
+
+def test_importar_livros_ndjson(client, db, auth_headers):
+    corpo = "\n".join([
+        '{"titulo": "Importado 1", "autor": "Autor Lote", "ano": 2001, "genero": "Ficção"}',
+        '{"titulo": "Importado 2", "autor": "Autor Lote", "ano": "não é ano", "genero": "Ficção"}',
+        "",
+        "{json quebrado",
+        '{"titulo": "Importado 3", "autor": "Autor Lote", "ano": 2003, "genero": "Drama"}',
+    ])
+    response = client.post(
+        "/livros/bulk",
+        params={"lote": 1},
+        content=corpo.encode(),
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    resultado = response.json()
+    assert resultado["inseridos"] == 2
+    assert resultado["com_erro"] == 2
+    assert [erro["linha"] for erro in resultado["erros"]] == [2, 4]
+    assert db.query(Livro).filter(Livro.autor == "Autor Lote").count() == 2
+
+def test_importar_livros_csv(client, db, auth_headers):
+    corpo = (
+        "titulo,autor,ano,genero\n"
+        '"Livro, com vírgula",Autor CSV,1990,Ficção\n'
+        '"Título em\nduas linhas",Autor CSV,1991,Drama\n'
+        "Sem ano,Autor CSV,,Drama\n"
+    )
+    response = client.post(
+        "/livros/bulk",
+        content=corpo.encode(),
+        headers={**auth_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    resultado = response.json()
+    assert resultado["inseridos"] == 2
+    assert resultado["erros"][0]["linha"] == 5
+    titulos = {livro.titulo for livro in db.query(Livro).filter(Livro.autor == "Autor CSV")}
+    assert titulos == {"Livro, com vírgula", "Título em\nduas linhas"}
+
+def test_importar_livros_sem_token(client):
+    response = client.post("/livros/bulk", content=b"")
+    assert response.status_code == 401
+
+def test_exportar_livros(client, db):
+    db.add(Livro(titulo="Exportado", autor="Autor Export", ano=1970, genero="Ensaio"))
+    db.commit()
+
+    response = client.get("/livros/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert "Exportado" in [linha["titulo"] for linha in linhas]
+    assert [linha["id"] for linha in linhas] == sorted(linha["id"] for linha in linhas)
+
+    response = client.get("/livros/export", params={"formato": "csv"})
+    assert response.status_code == 200
+    assert response.text.splitlines()[0].startswith("id,titulo,autor")
+
+    # Filtro por data de atualização
+    response = client.get("/livros/export", params={"atualizado_desde": "2999-01-01T00:00:00"})
+    assert response.text == ""
+
+def test_buscar_livro_etag(client, db, auth_headers):
+    novo_livro = Livro(titulo="Livro com ETag", autor="Autor Teste", ano=2024, genero="Ficção")
+    db.add(novo_livro)
+    db.commit()
+    db.refresh(novo_livro)
+
+    response = client.get(f"/livros/{novo_livro.id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    # Revalidação com a mesma ETag não reenvia o corpo
+    response = client.get(f"/livros/{novo_livro.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Atualizar o livro invalida a entrada em cache e muda a ETag
+    response = client.put(
+        f"/livros/{novo_livro.id}",
+        params={"titulo": "Livro com ETag 2", "autor": "Autor Teste", "ano": 2024, "genero": "Ficção"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    response = client.get(f"/livros/{novo_livro.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["titulo"] == "Livro com ETag 2"
+
+def test_cache_nao_guarda_leitura_anterior_a_uma_escrita(client, db):
+    livro = Livro(titulo="Livro Corrida", autor="Autor Corrida", ano=2024, genero="Ficção")
+    db.add(livro)
+    db.commit()
+
+    # Uma escrita termina (e invalida a chave) enquanto o GET ainda lê a versão anterior
+    def escrita_concorrente(conn, cursor, statement, parameters, context, executemany):
+        invalidar_livro(livro.id)
+
+    event.listen(database.engine_leitura, "after_cursor_execute", escrita_concorrente)
+    try:
+        assert client.get(f"/livros/{livro.id}").status_code == 200
+    finally:
+        event.remove(database.engine_leitura, "after_cursor_execute", escrita_concorrente)
+    assert cache_respostas.obter(chave_livro(livro.id)) is None
+
+    # A primeira leitura depois da invalidação vai ao banco principal (a réplica pode estar atrasada)
+    comandos = []
+    def guardar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", guardar)
+    try:
+        assert client.get(f"/livros/{livro.id}").status_code == 200
+        assert any("FROM livros" in comando for comando in comandos)
+        comandos.clear()
+        cache_respostas.limpar()
+        assert client.get(f"/livros/{livro.id}").status_code == 200
+        assert comandos == []  # Já regravada: a réplica volta a ser usada
+    finally:
+        event.remove(database.engine, "before_cursor_execute", guardar)
+    assert cache_respostas.obter(chave_livro(livro.id)) is not None
+
+def test_listar_livros_com_categoria(client, db):
+    categoria = Categoria(nome="Categoria Embutida")
+    db.add(categoria)
+    db.commit()
+    livro = Livro(titulo="Livro Embutido", autor="Autor Embutido", ano=2010, genero="Ficção", categoria_id=categoria.id)
+    db.add(livro)
+    db.commit()
+
+    response = client.get("/livros/", params={"autor": "Autor Embutido"})
+    assert "categoria" not in response.json()["items"][0]
+
+    response = client.get("/livros/", params={"autor": "Autor Embutido", "incluir_categoria": True})
+    assert response.json()["items"][0]["categoria"] == {"id": categoria.id, "nome": "Categoria Embutida"}
+
+    response = client.get(f"/livros/{livro.id}", params={"incluir_categoria": True})
+    assert response.json()["categoria"]["nome"] == "Categoria Embutida"
+    assert response.json()["titulo"] == "Livro Embutido"
+
+def test_etag_com_categoria_muda_com_a_categoria(client, db, auth_headers):
+    categoria = Categoria(nome="Categoria Revalidada")
+    db.add(categoria)
+    db.commit()
+    livro = Livro(titulo="Livro Revalidado", autor="Autor Revalidado", ano=2010, genero="Ficção", categoria_id=categoria.id)
+    db.add(livro)
+    db.commit()
+    etag = client.get(f"/livros/{livro.id}", params={"incluir_categoria": True}).headers["ETag"]
+
+    # Renomear a categoria não toca no livro, mas muda a resposta com a categoria embutida
+    client.patch(f"/categorias/{categoria.id}", json={"nome": "Categoria Renomeada"}, headers=auth_headers)
+    response = client.get(f"/livros/{livro.id}", params={"incluir_categoria": True}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["categoria"]["nome"] == "Categoria Renomeada"
+    assert response.headers["ETag"] != etag
+
+def test_buscar_livros_facetados(client, db):
+    categoria = Categoria(nome="Categoria Facetas")
+    db.add(categoria)
+    db.commit()
+    db.add_all([
+        Livro(titulo="Faceta 1", autor="Autor Facetas", ano=2001, genero="Faceta A", categoria_id=categoria.id),
+        Livro(titulo="Faceta 2", autor="Autor Facetas", ano=2001, genero="Faceta B", categoria_id=categoria.id),
+        Livro(titulo="Faceta 3", autor="Autor Facetas", ano=2002, genero="Faceta B", categoria_id=None),
+    ])
+    db.commit()
+
+    response = client.get("/livros/facetas", params={"autor": "Autor Facetas", "limite": 2})
+    assert response.status_code == 200
+    dados = response.json()
+    assert [livro["titulo"] for livro in dados["items"]] == ["Faceta 1", "Faceta 2"]
+    assert dados["next"] is not None
+    assert dados["facetas"]["genero"] == [{"valor": "Faceta B", "total": 2}, {"valor": "Faceta A", "total": 1}]
+    assert dados["facetas"]["ano"] == [{"valor": 2001, "total": 2}, {"valor": 2002, "total": 1}]
+    assert dados["facetas"]["categoria_id"] == [{"valor": categoria.id, "total": 2}, {"valor": None, "total": 1}]
+
+    # As contagens acompanham os filtros aplicados
+    response = client.get("/livros/facetas", params={"autor": "Autor Facetas", "genero": "Faceta B"})
+    dados = response.json()
+    assert len(dados["items"]) == 2
+    assert dados["facetas"]["ano"] == [{"valor": 2001, "total": 1}, {"valor": 2002, "total": 1}]
+
+def test_filtros_facetados_usam_indices(db):
+    with database.engine.connect() as conn:
+        assert verificar_planos(conn) == []
+
+def test_sugestoes_de_titulos_e_autores(client, db, auth_headers):
+    db.add(Livro(titulo="Órfãos do Eldorado", autor="Milton Hatoum", ano=2008, genero="Romance"))
+    db.commit()
+    indice_sugestoes.construir(database.engine)
+
+    # Sem acento e sem distinção de caixa; também casa o início de palavras internas
+    assert {"texto": "Órfãos do Eldorado", "tipo": "titulo"} in client.get("/livros/suggest", params={"q": "orfa"}).json()["sugestoes"]
+    assert {"texto": "Órfãos do Eldorado", "tipo": "titulo"} in client.get("/livros/suggest", params={"q": "ELDO"}).json()["sugestoes"]
+
+    response = client.post(
+        "/livros/",
+        params={"titulo": "Cinzas do Norte", "autor": "Milton Hatoum", "ano": 2005, "genero": "Romance"},
+        headers=auth_headers,
+    )
+    livro_id = response.json()["id"]
+    sugestoes = client.get("/livros/suggest", params={"q": "cinz"}).json()["sugestoes"]
+    assert sugestoes == [{"texto": "Cinzas do Norte", "tipo": "titulo"}]
+    # O autor de dois livros aparece uma vez só
+    assert client.get("/livros/suggest", params={"q": "milton h"}).json()["sugestoes"] == [{"texto": "Milton Hatoum", "tipo": "autor"}]
+
+    client.patch(f"/livros/{livro_id}", json={"titulo": "Cinzas do Sul"}, headers=auth_headers)
+    assert client.get("/livros/suggest", params={"q": "cinzas do n"}).json()["sugestoes"] == []
+    assert client.get("/livros/suggest", params={"q": "cinzas do s"}).json()["sugestoes"] == [{"texto": "Cinzas do Sul", "tipo": "titulo"}]
+
+    client.delete(f"/livros/{livro_id}", headers=auth_headers)
+    assert client.get("/livros/suggest", params={"q": "cinz"}).json()["sugestoes"] == []
+    assert client.get("/livros/suggest", params={"q": "milton"}).json()["sugestoes"] == [{"texto": "Milton Hatoum", "tipo": "autor"}]
+
+def test_sugestoes_mais_usadas_primeiro():
+    indice = IndiceSugestoes()
+    indice.atualizar(1, "Macunaíma", "Mário de Andrade")
+    indice.atualizar(2, "Amar, Verbo Intransitivo", "Mário de Andrade")
+    indice.atualizar(3, "Paulicéia Desvairada", "Mário de Andrade")
+    indice.atualizar(4, "Mar Morto", "Jorge Amado")
+    # O autor de três livros vem antes dos títulos; entre os empatados, a ordem alfabética
+    assert indice.sugerir("ma", limite=2) == [
+        {"texto": "Mário de Andrade", "tipo": "autor"},
+        {"texto": "Macunaíma", "tipo": "titulo"},
+    ]
+
+def test_rankings_guardados_seguem_as_escritas(monkeypatch):
+    # Limites pequenos para que "a" e "am" tenham ranking guardado e truncado
+    from app.services import sugestoes
+    monkeypatch.setattr(sugestoes, "LIMIAR_RANKING", 3)
+    monkeypatch.setattr(sugestoes, "CAPACIDADE_RANKING", 3)
+    monkeypatch.setattr(sugestoes, "SUGESTOES_MAXIMO", 2)
+    livros = {1: ("Amor", "Ana"), 2: ("Amado", "Ana"), 3: ("Asa", "Alba"), 4: ("Amigo", "Ana"), 5: ("Amar", "Alba")}
+    indice = IndiceSugestoes()
+    for livro_id, (titulo, autor) in livros.items():
+        indice.atualizar(livro_id, titulo, autor)
+    indice._rankings = indice._construir_rankings(indice._chaves, indice._usos)
+    assert {"a", "am"} <= set(indice._rankings)
+
+    def conferir():
+        # Mesmo resultado de um índice construído do zero com os livros atuais
+        novo = IndiceSugestoes()
+        for livro_id, (titulo, autor) in livros.items():
+            novo.atualizar(livro_id, titulo, autor)
+        for prefixo in ("a", "am", "ama"):
+            for limite in (1, 2):
+                assert indice.sugerir(prefixo, limite) == novo.sugerir(prefixo, limite)
+
+    conferir()
+    for livro_id, titulo, autor in [(6, "Amizade", "Alba"), (7, "Amizade", "Alba"), (2, "Asas", "Beto"), (1, "Amor", "Beto")]:
+        livros[livro_id] = (titulo, autor)
+        indice.atualizar(livro_id, titulo, autor)
+        conferir()
+    for livro_id in (6, 7, 3, 5):
+        del livros[livro_id]
+        indice.remover(livro_id)
+        conferir()
+
+@pytest.fixture()
+def escrita_agrupada():
+    escritor_agrupado.configurar(True, janela_ms=50, lote_maximo=64)
+    yield escritor_agrupado
+    escritor_agrupado.configurar(False, janela_ms=2, lote_maximo=64)
+
+def test_escrita_agrupada_em_lote(client, db, auth_headers, escrita_agrupada):
+    lotes, operacoes = escrita_agrupada.lotes, escrita_agrupada.operacoes
+    # Comandos que chegam de fato ao SQLite (o pysqlite pode emitir BEGIN/COMMIT por conta própria)
+    comandos = []
+    def rastrear(dbapi_connection, connection_record, connection_proxy):
+        dbapi_connection.set_trace_callback(comandos.append)
+    event.listen(database.engine_lotes, "checkout", rastrear)
+    respostas = {}
+    def criar(indice):
+        respostas[indice] = client.post(
+            "/livros/",
+            params={"titulo": f"Agrupado {indice}", "autor": "Autor Agrupado", "ano": 2020, "genero": "Ficção"},
+            headers=auth_headers,
+        )
+
+    threads = [threading.Thread(target=criar, args=(indice,)) for indice in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    event.remove(database.engine_lotes, "checkout", rastrear)
+    database.engine_lotes.dispose()  # Descarta as conexões com o rastreamento ligado
+
+    # Cada chamador recebe o próprio livro, gravados em menos transações do que requisições
+    assert sorted(resposta.json()["titulo"] for resposta in respostas.values()) == [f"Agrupado {indice}" for indice in range(6)]
+    assert len({resposta.json()["id"] for resposta in respostas.values()}) == 6
+    assert escrita_agrupada.operacoes - operacoes == 6
+    commits = comandos.count("COMMIT")
+    assert commits == escrita_agrupada.lotes - lotes < 6
+    assert comandos.count("BEGIN IMMEDIATE") == commits
+
+    # Um erro afeta só a operação que falhou
+    livro_id = respostas[0].json()["id"]
+    assert client.patch(f"/livros/{livro_id}", json={"ano": 2021}, headers=auth_headers).json()["ano"] == 2021
+    assert client.patch("/livros/999999", json={"ano": 2021}, headers=auth_headers).status_code == 404
+
+def test_projecao_de_campos(client, db):
+    db.add(Livro(titulo="Livro Projetado", autor="Autor Projetado", ano=2015, genero="Projeção"))
+    db.commit()
+
+    # Só as colunas pedidas, sempre com o id, e a projeção chega ao SELECT
+    comandos = []
+    def guardar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(database.engine_leitura, "before_cursor_execute", guardar)
+    try:
+        response = client.get("/livros/", params={"autor": "Autor Projetado", "fields": "titulo"})
+    finally:
+        event.remove(database.engine_leitura, "before_cursor_execute", guardar)
+    assert response.status_code == 200
+    livro = response.json()["items"][0]
+    assert set(livro) == {"id", "titulo"} and livro["titulo"] == "Livro Projetado"
+    assert any(comando.startswith("SELECT livros.id, livros.titulo \nFROM livros") for comando in comandos)
+
+    assert client.get(f"/livros/{livro['id']}", params={"fields": "ano,genero"}).json() == {"id": livro["id"], "ano": 2015, "genero": "Projeção"}
+    assert set(client.get("/livros/busca", params={"q": "projetado", "fields": "autor"}).json()["items"][0]) == {"id", "autor"}
+    assert set(client.get("/livros/facetas", params={"genero": "Projeção", "fields": "ano"}).json()["items"][0]) == {"id", "ano"}
+
+    assert client.get("/livros/", params={"fields": "titulo,senha"}).status_code == 400
+    assert client.get("/livros/", params={"fields": "titulo", "incluir_categoria": True}).status_code == 400
+
+def test_compressao_gzip(client, db):
+    db.add_all([Livro(titulo=f"Livro Comprimido {i}", autor="Autor Gzip", ano=2000, genero="Ficção") for i in range(30)])
+    db.commit()
+
+    response = client.get("/livros/", params={"autor": "Autor Gzip"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["items"]) == 30
+
+    # Abaixo do tamanho mínimo a resposta sai sem compressão
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_etag_da_resposta_comprimida(client, db, auth_headers, monkeypatch):
+    monkeypatch.setattr(configuracao_compressao, "tamanho_minimo", 1)  # Comprime até a resposta de um livro
+    livro = Livro(titulo="Livro ETag Gzip", autor="Autor Gzip", ano=2000, genero="Ficção")
+    db.add(livro)
+    db.commit()
+
+    sem_gzip = client.get(f"/livros/{livro.id}", headers={"Accept-Encoding": "identity"})
+    com_gzip = client.get(f"/livros/{livro.id}", headers={"Accept-Encoding": "gzip"})
+    assert com_gzip.headers["content-encoding"] == "gzip"
+    # Duas representações, duas ETags fortes
+    assert com_gzip.headers["ETag"] == sem_gzip.headers["ETag"][:-1] + '-gzip"'
+
+    # Cada ETag revalida a sua versão
+    response = client.get(f"/livros/{livro.id}", headers={"Accept-Encoding": "gzip", "If-None-Match": com_gzip.headers["ETag"]})
+    assert response.status_code == 304 and response.headers["ETag"] == com_gzip.headers["ETag"]
+    response = client.get(f"/livros/{livro.id}", headers={"Accept-Encoding": "identity", "If-None-Match": sem_gzip.headers["ETag"]})
+    assert response.status_code == 304 and response.headers["ETag"] == sem_gzip.headers["ETag"]
+
+def test_feed_de_alteracoes(client, db, auth_headers):
+    # Cursor do fim do feed atual: daqui em diante só as alterações deste teste
+    cursor = client.get("/livros/changes").json()["next"]
+    while True:
+        dados = client.get("/livros/changes", params={"since": cursor}).json()
+        cursor = dados["next"]
+        if not dados["tem_mais"]:
+            break
+
+    criado = client.post(
+        "/livros/", params={"titulo": "Livro Feed", "autor": "Autor Feed", "ano": 2001, "genero": "Ficção"}, headers=auth_headers
+    ).json()
+    removido = client.post(
+        "/livros/", params={"titulo": "Livro Feed 2", "autor": "Autor Feed", "ano": 2002, "genero": "Ficção"}, headers=auth_headers
+    ).json()
+
+    dados = client.get("/livros/changes", params={"since": cursor, "limite": 1}).json()
+    assert [(item["id"], item["operacao"]) for item in dados["items"]] == [(criado["id"], "I")]
+    assert dados["items"][0]["livro"]["titulo"] == "Livro Feed"
+    assert dados["tem_mais"] is True
+
+    # Só a alteração mais recente de cada livro fica no feed, com um seq novo
+    client.patch(f"/livros/{criado['id']}", json={"ano": 2011}, headers=auth_headers)
+    client.delete(f"/livros/{removido['id']}", headers=auth_headers)
+    dados = client.get("/livros/changes", params={"since": cursor}).json()
+    assert [(item["id"], item["operacao"]) for item in dados["items"]] == [(criado["id"], "U"), (removido["id"], "D")]
+    assert dados["items"][0]["livro"]["ano"] == 2011
+    assert dados["items"][1]["livro"] is None
+    assert dados["tem_mais"] is False
+
+    # Retomando do cursor devolvido não há nada novo, e o cursor se mantém
+    vazio = client.get("/livros/changes", params={"since": dados["next"]}).json()
+    assert vazio == {"items": [], "next": dados["next"], "tem_mais": False}
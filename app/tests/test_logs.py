@@ -0,0 +1,55 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+from app.utils.logs import AMOSTRAR, FiltroAmostragem, FormatadorJSON, HandlerFilaSemBloqueio
+
+def _logger_isolado(nome, handler):
+    logger = logging.getLogger(nome)
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    return logger
+
+def test_linhas_json_escritas_em_segundo_plano():
+    destino = io.StringIO()
+    saida = logging.StreamHandler(destino)
+    saida.setFormatter(FormatadorJSON())
+    handler = HandlerFilaSemBloqueio(queue.Queue())
+    listener = QueueListener(handler.queue, saida)
+    logger = _logger_isolado("teste.logs.json", handler)
+
+    listener.start()
+    logger.info("Livro com ID %s encontrado.", 42)
+    listener.stop()
+
+    registro = json.loads(destino.getvalue().strip())
+    assert registro["mensagem"] == "Livro com ID 42 encontrado."
+    assert registro["nivel"] == "INFO"
+    assert registro["logger"] == "teste.logs.json"
+
+def test_fila_cheia_descarta_sem_bloquear():
+    handler = HandlerFilaSemBloqueio(queue.Queue(maxsize=2))
+    logger = _logger_isolado("teste.logs.fila", handler)
+
+    for i in range(5):
+        logger.warning("mensagem %s", i)
+
+    assert handler.queue.qsize() == 2
+    assert handler.descartados == 3
+    # A formatação fica para a thread de escrita
+    assert handler.queue.get_nowait().args == (0,)
+
+def test_amostragem_apenas_das_mensagens_marcadas():
+    handler = HandlerFilaSemBloqueio(queue.Queue())
+    handler.addFilter(FiltroAmostragem(0.0))
+    logger = _logger_isolado("teste.logs.amostragem", handler)
+
+    for _ in range(10):
+        logger.info("Listando %s livros.", 10, extra=AMOSTRAR)
+    logger.info("Livro criado")
+    logger.warning("Aviso marcado", extra=AMOSTRAR)
+
+    mensagens = [handler.queue.get_nowait().getMessage() for _ in range(handler.queue.qsize())]
+    assert mensagens == ["Livro criado", "Aviso marcado"]
@@ -0,0 +1,27 @@
+import logging
+from app.models.livro import Livro
+from app.utils.metricas import registro_metricas
+
+def test_metricas_por_rota(client, db):
+    livro = Livro(titulo="Livro Métricas", autor="Autor", ano=2020, genero="Ficção")
+    db.add(livro)
+    db.commit()
+    registro_metricas.limpar()
+
+    client.get(f"/livros/{livro.id}")
+    client.get("/livros/999999")
+
+    texto = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/livros/{livro_id}",status="200"} 1' in texto
+    assert 'http_requests_total{method="GET",route="/livros/{livro_id}",status="404"} 1' in texto
+    assert 'http_request_duration_seconds_count{method="GET",route="/livros/{livro_id}"} 2' in texto
+    assert 'db_queries_total{method="GET",route="/livros/{livro_id}"} 2' in texto
+
+def test_log_requisicao_lenta(client, caplog, monkeypatch):
+    # Limite mínimo: toda requisição é considerada lenta
+    monkeypatch.setattr(registro_metricas, "limite_lento_ms", 0.000001)
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.metricas"):
+        client.get("/livros/", params={"limite": 1})
+    mensagens = [registro.getMessage() for registro in caplog.records]
+    assert any("Requisição lenta: GET /livros/" in mensagem and "FROM livros" in mensagem for mensagem in mensagens)
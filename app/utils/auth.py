@@ -1,51 +1,50 @@
 from fastapi import Depends, HTTPException, status
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
+from app.config import Settings, obter_configuracoes
 from app.database import get_db
 from sqlalchemy.orm import Session
 from app.models.user import Usuario
-import os
+from app.utils.cache import CacheLRU
+from app.utils.hash_senha import criar_contexto, pool_hash
+from dataclasses import dataclass
+from sqlalchemy import event
+import time
 import datetime
-from dotenv import load_dotenv
 
-# Carregar variáveis de ambiente
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
+# As configurações (SECRET_KEY, expiração) vêm de obter_configuracoes(), carregadas uma única vez.
+# jose e passlib são importados sob demanda para não pesar na partida da aplicação.
 ALGORITHM = "HS256"  # Garantindo o uso do algoritmo correto
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
-
-# Contexto para hash de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Função para gerar hash da senha
 def gerar_hash_senha(senha: str) -> str:
-    return pwd_context.hash(senha)
+    return criar_contexto(pool_hash.rounds).hash(senha)
 
 # Função para verificar a senha
 def verificar_senha(senha: str, senha_hash: str) -> bool:
-    return pwd_context.verify(senha, senha_hash)
+    return criar_contexto(pool_hash.rounds).verify(senha, senha_hash)
 
 # Função para criar o token JWT
 def criar_acesso_token(data: dict):
+    from jose import jwt
+    configuracoes = obter_configuracoes()
+
     # Definir a expiração do token
-    expiracao = datetime.datetime.utcnow() + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expiracao = datetime.datetime.utcnow() + datetime.timedelta(minutes=configuracoes.access_token_expire_minutes)
     
     # Definir os dados a serem codificados no token
     to_encode = data.copy()
     to_encode.update({"exp": expiracao})
 
     # Gerar o token JWT
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, configuracoes.secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 # Função para verificar o token
 def verificar_token(token: str) -> Optional[str]:
+    from jose import JWTError, jwt
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, obter_configuracoes().secret_key, algorithms=[ALGORITHM])
         return payload.get("sub")  # O "sub" é geralmente usado como ID do usuário
     except JWTError:
         return None
@@ -53,22 +52,55 @@ def verificar_token(token: str) -> Optional[str]:
 # Segurança OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Usuário autenticado mantido em cache (somente os dados usados pelos endpoints)
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    id: int
+    nome_usuario: str
+
+# Cache de usuários autenticados por token; cada entrada vale no máximo até a expiração do token
+cache_usuarios = CacheLRU(tamanho_maximo=Settings.cache_usuarios_tamanho, ttl=Settings.cache_usuarios_ttl)
+
+# Remove do cache todos os tokens de um usuário (chamar quando ele for alterado ou removido)
+def invalidar_usuario(nome_usuario: str):
+    cache_usuarios.remover_se(lambda token, usuario: usuario.nome_usuario == nome_usuario)
+
+# Usado pela sincronização entre processos, que só conhece o id dos usuários alterados
+def invalidar_usuario_por_id(usuario_id: int):
+    cache_usuarios.remover_se(lambda token, usuario: usuario.id == usuario_id)
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _invalidar_usuario_alterado(mapper, connection, usuario):
+    invalidar_usuario(usuario.nome_usuario)
+
 # Função para pegar o usuário atual baseado no token
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    usuario = cache_usuarios.obter(token)
+    if usuario is not None:
+        return usuario
+
+    from jose import JWTError, jwt
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, obter_configuracoes().secret_key, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
+    marca = cache_usuarios.marca()  # Usuário alterado durante a leitura não entra no cache
     user = db.query(Usuario).filter(Usuario.nome_usuario == username).first()
     if user is None:
         raise credentials_exception
-    return user
+
+    usuario = UsuarioAutenticado(id=user.id, nome_usuario=user.nome_usuario)
+    expira_em = payload.get("exp")
+    if expira_em is not None:
+        cache_usuarios.definir(token, usuario, ttl=expira_em - time.time(), desde=marca)
+    return usuario
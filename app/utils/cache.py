@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_AUSENTE = object()
+
+# Cache em memória do processo com despejo LRU e expiração por entrada (TTL)
+class CacheLRU:
+    def __init__(self, tamanho_maximo: int, ttl: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        # Relógio lógico das invalidações, para quem lê a fonte sem o lock não gravar um valor
+        # que ficou velho no meio da leitura (ver marca e definir)
+        self._relogio = 0
+        self._invalidadas = {}  # chave -> [momento da invalidação, já regravada depois dela]
+        self._tudo_invalidado_em = 0  # Invalidação que vale para qualquer chave
+
+    def obter(self, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                return padrao
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._dados[chave]
+                return padrao
+            self._dados.move_to_end(chave)
+            return valor
+
+    # Momento atual do relógio de invalidações; obtido antes de ler a fonte e passado a definir
+    def marca(self) -> int:
+        with self._lock:
+            return self._relogio
+
+    # A chave foi invalidada e ainda não foi regravada: a próxima leitura deve ir ao banco principal,
+    # já que uma réplica atrasada ainda pode ter a versão anterior
+    def pendente(self, chave: Hashable) -> bool:
+        with self._lock:
+            invalidacao = self._invalidadas.get(chave)
+            return invalidacao is not None and not invalidacao[1]
+
+    # ttl opcional sobrescreve o padrão do cache; valores <= 0 não são armazenados.
+    # Com desde (uma marca), o valor é descartado se a chave foi invalidada depois da marca:
+    # a leitura pode ter visto a versão anterior a uma escrita que terminou no meio dela.
+    def definir(self, chave: Hashable, valor: Any, ttl: Optional[float] = None, desde: Optional[int] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.tamanho_maximo <= 0:
+            return
+        with self._lock:
+            invalidacao = self._invalidadas.get(chave)
+            if desde is not None:
+                if self._tudo_invalidado_em > desde or (invalidacao is not None and invalidacao[0] > desde):
+                    return
+            if invalidacao is not None:
+                invalidacao[1] = True
+            self._dados[chave] = (time.monotonic() + ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+    # Chamado com o lock; o registro é limitado ao tamanho do cache (além disso, vale para todas)
+    def _registrar_invalidacao(self, chave: Hashable):
+        self._invalidadas[chave] = [self._relogio, False]
+        if len(self._invalidadas) > max(self.tamanho_maximo, 1):
+            self._invalidadas.clear()
+            self._tudo_invalidado_em = self._relogio
+
+    def remover(self, chave: Hashable):
+        with self._lock:
+            self._relogio += 1
+            self._registrar_invalidacao(chave)
+            self._dados.pop(chave, None)
+
+    # Remove as entradas para as quais predicado(chave, valor) é verdadeiro. Chaves fora do cache
+    # também podem ter sido afetadas, então leituras em andamento não gravam nenhuma chave.
+    def remover_se(self, predicado: Callable[[Hashable, Any], bool]) -> int:
+        with self._lock:
+            self._relogio += 1
+            self._tudo_invalidado_em = self._relogio
+            chaves = [chave for chave, (_, valor) in self._dados.items() if predicado(chave, valor)]
+            for chave in chaves:
+                self._registrar_invalidacao(chave)
+                del self._dados[chave]
+            return len(chaves)
+
+    # Ajusta os limites do cache (a partir das configurações da aplicação)
+    def configurar(self, tamanho_maximo: int, ttl: float):
+        with self._lock:
+            self.tamanho_maximo = tamanho_maximo
+            self.ttl = ttl
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._relogio += 1
+            self._tudo_invalidado_em = self._relogio
+            self._invalidadas.clear()
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
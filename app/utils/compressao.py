@@ -0,0 +1,67 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder
+
+# Os bytes comprimidos são outra representação: a ETag forte não pode ser a mesma da versão sem
+# compressão (RFC 9110, 8.8.3). A resposta em gzip leva a ETag com este sufixo dentro das aspas.
+SUFIXO_ETAG_GZIP = "-gzip"
+
+# Parâmetros da compressão, ajustados por aplicar_configuracoes (a pilha de middlewares é montada
+# antes do lifespan carregar as configurações, então o middleware os lê a cada requisição)
+class ConfiguracaoCompressao:
+    def __init__(self, tamanho_minimo: int = 1024, nivel: int = 6):
+        self.tamanho_minimo = tamanho_minimo  # Respostas menores saem sem compressão; negativo desliga
+        self.nivel = nivel
+
+configuracao_compressao = ConfiguracaoCompressao()
+
+def etag_gzip(etag: str) -> str:
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag  # ETag fraca: equivalência semântica, vale para as duas codificações
+    return etag[:-1] + SUFIXO_ETAG_GZIP + '"'
+
+# If-None-Match com as ETags de volta à forma sem sufixo, que é a que os endpoints comparam
+def _remover_sufixo_gzip(if_none_match: str) -> str:
+    sufixo = SUFIXO_ETAG_GZIP + '"'
+    etags = [etag.strip() for etag in if_none_match.split(",")]
+    return ", ".join(etag[: -len(sufixo)] + '"' if etag.endswith(sufixo) else etag for etag in etags)
+
+# GZip das respostas para clientes que enviam Accept-Encoding: gzip (inclusive as em streaming)
+class MiddlewareCompressao:
+    def __init__(self, app, configuracao: ConfiguracaoCompressao = configuracao_compressao):
+        self.app = app
+        self.configuracao = configuracao
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.configuracao.tamanho_minimo >= 0:
+            if "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+                responder = GZipResponder(self.app, self.configuracao.tamanho_minimo, compresslevel=self.configuracao.nivel)
+                await responder(self._sem_sufixo(scope), receive, self._ajustar_etag(scope, send))
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _sem_sufixo(scope):
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if not if_none_match or SUFIXO_ETAG_GZIP not in if_none_match:
+            return scope
+        scope = dict(scope)
+        MutableHeaders(scope=scope)["if-none-match"] = _remover_sufixo_gzip(if_none_match)
+        return scope
+
+    # Respostas comprimidas levam a ETag da versão em gzip; um 304 devolve a ETag na forma que o
+    # cliente enviou (com sufixo se o que ele guardou era a versão comprimida)
+    @staticmethod
+    def _ajustar_etag(scope, send):
+        if_none_match = Headers(scope=scope).get("if-none-match", "")
+        cliente_tem_gzip = SUFIXO_ETAG_GZIP + '"' in if_none_match
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                headers = MutableHeaders(scope=mensagem)
+                etag = headers.get("etag")
+                comprimida = headers.get("content-encoding") == "gzip"
+                if etag and (comprimida or (mensagem["status"] == 304 and cliente_tem_gzip)):
+                    headers["etag"] = etag_gzip(etag)
+            await send(mensagem)
+
+        return enviar
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from app.config import Settings
+
+# Contexto de hash com a política de custo atual; hashes com outro custo precisam ser refeitos
+# (passlib é importado só quando o primeiro hash é feito, para não pesar na partida)
+@lru_cache(maxsize=None)
+def criar_contexto(rounds: int):
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+# Funções executadas nos processos do pool
+def _gerar_hash(senha: str, rounds: int) -> str:
+    return criar_contexto(rounds).hash(senha)
+
+def _verificar_e_atualizar(senha: str, senha_hash: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return criar_contexto(rounds).verify_and_update(senha, senha_hash)
+
+# Pool de processos limitado para o bcrypt, para que rajadas de login não ocupem o threadpool
+# nem o GIL do servidor; quando a fila enche, a requisição é recusada na hora com 503.
+# rounds é o custo do bcrypt; ao mudar, os hashes antigos são refeitos no próximo login bem-sucedido.
+class PoolHash:
+    def __init__(self, workers: int, fila_maxima: int, rounds: int):
+        self.workers = workers
+        self.rounds = rounds
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # Aplica as configurações; o pool de processos é recriado no próximo uso
+    def configurar(self, workers: int, fila_maxima: int, rounds: int):
+        self.encerrar()
+        self.workers = workers
+        self.rounds = rounds
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, tente novamente",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            return await asyncio.wrap_future(self._obter_executor().submit(funcao, *args))
+        finally:
+            self._vagas.release()
+
+    async def gerar_hash(self, senha: str) -> str:
+        return await self._executar(_gerar_hash, senha, self.rounds)
+
+    # Retorna (senha_valida, novo_hash); novo_hash vem preenchido quando a política de custo mudou
+    async def verificar(self, senha: str, senha_hash: str) -> Tuple[bool, Optional[str]]:
+        return await self._executar(_verificar_e_atualizar, senha, senha_hash, self.rounds)
+
+    def encerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Ajustado por create_app a partir das configurações
+pool_hash = PoolHash(workers=1, fila_maxima=4, rounds=Settings.bcrypt_rounds)
+
+# Processos do pool não passam para o filho de um fork; ele cria os seus no primeiro uso
+def _esquecer_pool_herdado():
+    pool_hash._executor = None
+    pool_hash._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_esquecer_pool_herdado)
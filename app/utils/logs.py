@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.utils.metricas import registro_metricas
+
+# Marca uma mensagem INFO de alto volume como sujeita à amostragem: logger.info(..., extra=AMOSTRAR)
+AMOSTRAR = {"amostrar": True}
+
+# Formata cada registro como uma linha JSON (executado na thread do QueueListener)
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+        }
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+# Descarta a maior parte das mensagens INFO marcadas com AMOSTRAR, mantendo a taxa configurada
+class FiltroAmostragem(logging.Filter):
+    def __init__(self, taxa: float):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno == logging.INFO and getattr(record, "amostrar", False):
+            return self.taxa >= 1.0 or random.random() < self.taxa
+        return True
+
+# Só enfileira o registro: a formatação e a escrita ficam com a thread do QueueListener.
+# Com a fila cheia, o registro é descartado (e contado) em vez de bloquear a requisição.
+class HandlerFilaSemBloqueio(QueueHandler):
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[HandlerFilaSemBloqueio] = None
+
+def _metricas_logs():
+    return [
+        "# HELP log_records_dropped_total Registros de log descartados com a fila cheia.",
+        "# TYPE log_records_dropped_total counter",
+        f"log_records_dropped_total {_handler.descartados if _handler else 0}",
+    ]
+
+# Liga o pipeline de logs: handler de fila no logger raiz e escrita em JSON numa thread própria.
+# taxa_amostragem é a fração das mensagens INFO marcadas com AMOSTRAR que é de fato registrada.
+def configurar_logs(nivel: str = "INFO", tamanho_fila: int = 10000, taxa_amostragem: float = 1.0, destino=None):
+    global _listener, _handler
+    encerrar_logs()
+
+    saida = logging.StreamHandler(destino or sys.stderr)
+    saida.setFormatter(FormatadorJSON())
+
+    _handler = HandlerFilaSemBloqueio(queue.Queue(maxsize=tamanho_fila))
+    _handler.addFilter(FiltroAmostragem(taxa_amostragem))
+
+    raiz = logging.getLogger()
+    for handler in [h for h in raiz.handlers if isinstance(h, HandlerFilaSemBloqueio)]:
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler)
+    raiz.setLevel(nivel)
+
+    _listener = QueueListener(_handler.queue, saida, respect_handler_level=True)
+    _listener.start()
+    registro_metricas.adicionar_coletor(_metricas_logs)
+
+# Esvazia a fila e para a thread de escrita (chamado no desligamento da aplicação)
+def encerrar_logs():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# A thread de escrita não existe no filho de um fork: ele não tenta pará-la e chama configurar_logs
+def _esquecer_listener_herdado():
+    global _listener
+    _listener = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_esquecer_listener_herdado)
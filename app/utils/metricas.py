@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Limites (em segundos) dos buckets do histograma de latência
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAXIMO_SQL_POR_REQUISICAO = 50
+
+# Consultas e tempo de banco acumulados pela requisição em andamento
+class EstatisticasRequisicao:
+    __slots__ = ("consultas", "tempo_db", "sql")
+
+    def __init__(self, guardar_sql: bool):
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.sql: Optional[List[str]] = [] if guardar_sql else None
+
+_requisicao_atual: ContextVar[Optional[EstatisticasRequisicao]] = ContextVar("requisicao_atual", default=None)
+
+class _Histograma:
+    __slots__ = ("buckets", "soma", "total")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_LATENCIA)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if valor <= limite:
+                self.buckets[i] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+# Registro das métricas do processo, exportado no formato texto do Prometheus
+class RegistroMetricas:
+    def __init__(self):
+        # Log de requisições lentas (opcional): acima deste tempo, loga a requisição com o SQL executado
+        self.limite_lento_ms = 0.0
+        self._lock = threading.Lock()
+        self._requisicoes: Dict[Tuple[str, str, str], int] = {}
+        self._latencias: Dict[Tuple[str, str], _Histograma] = {}
+        self._consultas: Dict[Tuple[str, str], int] = {}
+        self._tempo_db: Dict[Tuple[str, str], float] = {}
+        self._coletores: List[Callable[[], List[str]]] = []
+
+    # Coletor extra: função que devolve linhas prontas no formato do Prometheus
+    def adicionar_coletor(self, coletor: Callable[[], List[str]]):
+        if coletor not in self._coletores:
+            self._coletores.append(coletor)
+
+    def registrar(self, metodo: str, rota: str, status: int, duracao: float, estatisticas: EstatisticasRequisicao):
+        chave = (metodo, rota)
+        with self._lock:
+            chave_status = (metodo, rota, str(status))
+            self._requisicoes[chave_status] = self._requisicoes.get(chave_status, 0) + 1
+            self._latencias.setdefault(chave, _Histograma()).observar(duracao)
+            self._consultas[chave] = self._consultas.get(chave, 0) + estatisticas.consultas
+            self._tempo_db[chave] = self._tempo_db.get(chave, 0.0) + estatisticas.tempo_db
+
+    def limpar(self):
+        with self._lock:
+            self._requisicoes.clear()
+            self._latencias.clear()
+            self._consultas.clear()
+            self._tempo_db.clear()
+
+    def exportar(self) -> str:
+        linhas = []
+        with self._lock:
+            linhas.append("# HELP http_requests_total Requisições HTTP atendidas.")
+            linhas.append("# TYPE http_requests_total counter")
+            for (metodo, rota, status), total in sorted(self._requisicoes.items()):
+                linhas.append(f'http_requests_total{{method="{metodo}",route="{_escapar(rota)}",status="{status}"}} {total}')
+
+            linhas.append("# HELP http_request_duration_seconds Latência das requisições HTTP.")
+            linhas.append("# TYPE http_request_duration_seconds histogram")
+            for (metodo, rota), histograma in sorted(self._latencias.items()):
+                rotulos = f'method="{metodo}",route="{_escapar(rota)}"'
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS_LATENCIA, histograma.buckets):
+                    acumulado += quantidade
+                    linhas.append(f'http_request_duration_seconds_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+                linhas.append(f'http_request_duration_seconds_bucket{{{rotulos},le="+Inf"}} {histograma.total}')
+                linhas.append(f"http_request_duration_seconds_sum{{{rotulos}}} {histograma.soma}")
+                linhas.append(f"http_request_duration_seconds_count{{{rotulos}}} {histograma.total}")
+
+            linhas.append("# HELP db_queries_total Consultas SQL executadas, por rota.")
+            linhas.append("# TYPE db_queries_total counter")
+            for (metodo, rota), total in sorted(self._consultas.items()):
+                linhas.append(f'db_queries_total{{method="{metodo}",route="{_escapar(rota)}"}} {total}')
+
+            linhas.append("# HELP db_query_duration_seconds_total Tempo gasto em consultas SQL, por rota.")
+            linhas.append("# TYPE db_query_duration_seconds_total counter")
+            for (metodo, rota), total in sorted(self._tempo_db.items()):
+                linhas.append(f'db_query_duration_seconds_total{{method="{metodo}",route="{_escapar(rota)}"}} {total}')
+            coletores = list(self._coletores)
+        for coletor in coletores:
+            linhas.extend(coletor())
+        return "\n".join(linhas) + "\n"
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+registro_metricas = RegistroMetricas()
+
+# Hooks do SQLAlchemy que atribuem cada consulta (e seu tempo) à requisição atual
+def instrumentar_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["inicio_consultas"].pop()
+        estatisticas = _requisicao_atual.get()
+        if estatisticas is None:
+            return
+        estatisticas.consultas += 1
+        estatisticas.tempo_db += time.perf_counter() - inicio
+        if estatisticas.sql is not None and len(estatisticas.sql) < MAXIMO_SQL_POR_REQUISICAO:
+            estatisticas.sql.append(statement)
+
+# Middleware ASGI que mede cada requisição HTTP e registra latência, status e uso do banco por rota
+class MiddlewareMetricas:
+    def __init__(self, app, registro: RegistroMetricas = registro_metricas):
+        self.app = app
+        self.registro = registro
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limite_lento_ms = self.registro.limite_lento_ms
+        estatisticas = EstatisticasRequisicao(guardar_sql=limite_lento_ms > 0)
+        token = _requisicao_atual.set(estatisticas)
+        status = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _requisicao_atual.reset(token)
+            # Usa o caminho declarado da rota (ex.: /livros/{livro_id}) para não explodir a cardinalidade
+            rota = getattr(scope.get("route"), "path", "<nao_roteada>")
+            self.registro.registrar(scope["method"], rota, status, duracao, estatisticas)
+            if limite_lento_ms > 0 and duracao * 1000 >= limite_lento_ms:
+                logger.warning(
+                    "Requisição lenta: %s %s %d em %.1f ms, %d consulta(s) (%.1f ms no banco): %s",
+                    scope["method"], rota, status, duracao * 1000, estatisticas.consultas,
+                    estatisticas.tempo_db * 1000, estatisticas.sql,
+                )
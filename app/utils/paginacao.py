@@ -0,0 +1,41 @@
+import base64
+import binascii
+from typing import Optional, Tuple
+from fastapi import HTTPException
+
+# Tamanho de página padrão e limite máximo aceito na listagem
+TAMANHO_PAGINA_PADRAO = 50
+TAMANHO_PAGINA_MAXIMO = 500
+
+# Gera o cursor opaco a partir do último ID retornado na página
+def codificar_cursor(ultimo_id: int) -> str:
+    return base64.urlsafe_b64encode(str(ultimo_id).encode()).decode().rstrip("=")
+
+# Converte o cursor opaco de volta para o último ID visto (None se não houver cursor)
+def decodificar_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + preenchimento).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+# Cursor do feed de alterações: a posição (xid, seq) da última alteração entregue. Com xid 0 (SQLite)
+# fica igual ao cursor de um seq, e os cursores emitidos antes da posição continuam valendo.
+def codificar_posicao(posicao: Tuple[int, int]) -> str:
+    xid, seq = posicao
+    return codificar_cursor(seq) if xid == 0 else base64.urlsafe_b64encode(f"{xid}.{seq}".encode()).decode().rstrip("=")
+
+def decodificar_posicao(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        partes = base64.urlsafe_b64decode(cursor + preenchimento).decode().split(".")
+        if len(partes) == 1:
+            return 0, int(partes[0])
+        xid, seq = partes
+        return int(xid), int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
@@ -0,0 +1,56 @@
+"""Compara a serialização de uma página de 1.000 livros antes e depois dos schemas tipados.
+
+Uso: python -m benchmarks.bench_serializacao [--livros 1000] [--repeticoes 50]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.models.categoria import Categoria
+from app.models.livro import Livro
+from app.schemas.livro import LivroComCategoria, LivroResponse, Pagina
+
+# Livros em memória como viriam do banco; com categoria=None a relação não é carregada
+def gerar_livros(quantidade: int, categoria=None):
+    agora = datetime.utcnow()
+    livros = []
+    for i in range(1, quantidade + 1):
+        livro = Livro(
+            id=i, titulo=f"Livro {i}", autor=f"Autor {i % 97}", ano=1900 + i % 120, genero="Ficção",
+            categoria_id=1, created_at=agora, updated_at=agora,
+        )
+        if categoria is not None:
+            livro.categoria = categoria
+        livros.append(livro)
+    return livros
+
+def medir(funcao, repeticoes: int) -> float:
+    funcao()  # Aquecimento
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--livros", type=int, default=1000)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    livros = gerar_livros(args.livros)
+    # O jsonable_encoder não serve para livros com a categoria carregada (Categoria.livros gera recursão)
+    livros_com_categoria = gerar_livros(args.livros, categoria=Categoria(id=1, nome="Ficção"))
+    cenarios = {
+        # Antes: objetos SQLAlchemy passando pelo jsonable_encoder e pelo JSONResponse
+        "antes_jsonable_encoder": lambda: JSONResponse(jsonable_encoder({"items": livros, "next": None})).body,
+        # Depois: schema Pydantic v2 (from_attributes) e ORJSONResponse
+        "depois_pydantic_orjson": lambda: ORJSONResponse(Pagina[LivroResponse](items=livros).model_dump()).body,
+        "depois_com_categoria": lambda: ORJSONResponse(Pagina[LivroComCategoria](items=livros_com_categoria).model_dump()).body,
+    }
+    resultado = {nome: round(medir(funcao, args.repeticoes), 3) for nome, funcao in cenarios.items()}
+    print(json.dumps({"livros": args.livros, "ms_por_pagina": resultado}, indent=2))
+
+if __name__ == "__main__":
+    main()
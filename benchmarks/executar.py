@@ -0,0 +1,276 @@
+"""Benchmark reprodutível dos endpoints com catálogos sintéticos de tamanhos diferentes.
+
+Para cada tamanho, semeia um SQLite descartável, dispara as requisições em processo (httpx + ASGI)
+com concorrência fixa e imprime p50/p95/p99 e vazão de cada operação em JSON. Antes dos cenários,
+mede a partida a frio em processos novos: importação da aplicação, lifespan e primeira resposta.
+
+Uso: python -m benchmarks.executar [--tamanhos 10000 100000 1000000] [--concorrencia 8]
+                                   [--requisicoes 500] [--partidas 5] [--saida resultado.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+OPERACOES = ["listar", "buscar", "facetar", "sugerir", "obter", "criar", "atualizar", "deletar", "login"]
+
+def _percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+# Executado em um processo novo: importa a aplicação, roda o lifespan e responde GET /
+SCRIPT_PARTIDA = """
+import json, time
+from fastapi.testclient import TestClient
+inicio = time.perf_counter()
+from app.main import app
+importado = time.perf_counter()
+with TestClient(app) as cliente:
+    iniciado = time.perf_counter()
+    cliente.get("/").raise_for_status()
+    respondido = time.perf_counter()
+print(json.dumps({
+    "importacao_ms": (importado - inicio) * 1000,
+    "lifespan_ms": (iniciado - importado) * 1000,
+    "primeira_resposta_ms": (respondido - iniciado) * 1000,
+    "total_ms": (respondido - inicio) * 1000,
+}))
+"""
+
+def _medir_partida_a_frio(partidas: int, diretorio: str):
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(diretorio, 'partida.db')}", LOG_NIVEL="WARNING")
+    medicoes = []
+    for _ in range(partidas):
+        saida = subprocess.check_output([sys.executable, "-c", SCRIPT_PARTIDA], cwd=raiz, env=ambiente, text=True)
+        medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+    # A primeira partida cria o schema; as seguintes só conferem a versão gravada
+    resultado = {"criando_schema": {chave: round(valor, 1) for chave, valor in medicoes[0].items()}}
+    if len(medicoes) > 1:
+        resultado["mediana_schema_existente"] = {
+            chave: round(statistics.median(medicao[chave] for medicao in medicoes[1:]), 1) for chave in medicoes[0]
+        }
+    return resultado
+
+def _commit_atual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Cada operação recebe o cliente, um gerador aleatório e o estado compartilhado do cenário
+async def _listar(cliente, rng, estado):
+    from app.utils.paginacao import codificar_cursor
+    return await cliente.get("/livros/", params={"limite": 50, "cursor": codificar_cursor(rng.randint(0, estado["livros"]))})
+
+async def _buscar(cliente, rng, estado):
+    from benchmarks.semear import PALAVRAS
+    palavra = rng.choice(PALAVRAS)
+    return await cliente.get("/livros/busca", params={"q": palavra[: rng.randint(3, len(palavra))], "limite": 20})
+
+async def _facetar(cliente, rng, estado):
+    from benchmarks.semear import GENEROS
+    filtros = {"genero": rng.choice(GENEROS), "ano": rng.randint(1900, 2024), "categoria_id": rng.randint(1, 50)}
+    # Uma ou duas facetas aplicadas, como na barra lateral de filtros
+    params = dict(rng.sample(sorted(filtros.items()), rng.randint(1, 2)))
+    return await cliente.get("/livros/facetas", params={**params, "limite": 20})
+
+def _prefixo_aleatorio(rng):
+    from benchmarks.semear import PALAVRAS
+    palavra = rng.choice(PALAVRAS)
+    return palavra[: rng.randint(1, len(palavra))]
+
+async def _sugerir(cliente, rng, estado):
+    return await cliente.get("/livros/suggest", params={"q": _prefixo_aleatorio(rng)})
+
+# Custo do índice de sugestões em si, sem HTTP: construção e consultas por prefixo
+def _medir_indice_sugestoes(engine, consultas: int, semente: int):
+    from app.services.sugestoes import indice_sugestoes
+
+    inicio = time.perf_counter()
+    indice_sugestoes.construir(engine)
+    construcao = time.perf_counter() - inicio
+    rng = random.Random(semente)
+    latencias = []
+    for _ in range(consultas):
+        prefixo = _prefixo_aleatorio(rng)
+        inicio = time.perf_counter()
+        indice_sugestoes.sugerir(prefixo)
+        latencias.append((time.perf_counter() - inicio) * 1_000_000)
+    return {
+        "construcao_s": round(construcao, 2),
+        "p50_us": round(_percentil(latencias, 50), 1),
+        "p99_us": round(_percentil(latencias, 99), 1),
+    }
+
+async def _obter(cliente, rng, estado):
+    return await cliente.get(f"/livros/{rng.randint(1, estado['livros'])}")
+
+async def _criar(cliente, rng, estado):
+    resposta = await cliente.post(
+        "/livros/",
+        params={"titulo": f"Benchmark {rng.random()}", "autor": "Autor Benchmark", "ano": 2024, "genero": "Ficção"},
+        headers=estado["headers"],
+    )
+    if resposta.status_code == 201:
+        estado["criados"].append(resposta.json()["id"])
+    return resposta
+
+async def _atualizar(cliente, rng, estado):
+    return await cliente.put(
+        f"/livros/{rng.randint(1, estado['livros'])}",
+        params={"titulo": f"Atualizado {rng.random()}", "autor": "Autor Benchmark", "ano": 2023, "genero": "Drama"},
+        headers=estado["headers"],
+    )
+
+async def _deletar(cliente, rng, estado):
+    # Remove primeiro os livros criados pelo benchmark; depois, livros semeados ainda não removidos
+    livro_id = estado["criados"].pop() if estado["criados"] else estado["proximo_a_remover"].pop()
+    return await cliente.delete(f"/livros/{livro_id}", headers=estado["headers"])
+
+async def _login(cliente, rng, estado):
+    from benchmarks.semear import SENHA_BENCHMARK, USUARIO_BENCHMARK
+    return await cliente.post("/login", data={"username": USUARIO_BENCHMARK, "password": SENHA_BENCHMARK})
+
+FUNCOES = {
+    "listar": _listar, "buscar": _buscar, "facetar": _facetar, "sugerir": _sugerir, "obter": _obter, "criar": _criar,
+    "atualizar": _atualizar, "deletar": _deletar, "login": _login,
+}
+
+async def _medir_operacao(cliente, operacao, requisicoes: int, concorrencia: int, estado, semente: int):
+    funcao = FUNCOES[operacao]
+    latencias, erros = [], 0
+    restantes = iter(range(requisicoes))
+
+    async def trabalhador(numero):
+        nonlocal erros
+        rng = random.Random(f"{semente}-{operacao}-{numero}")
+        for _ in restantes:
+            inicio = time.perf_counter()
+            resposta = await funcao(cliente, rng, estado)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code >= 400:
+                erros += 1
+
+    # Aquecimento (não medido): sobe pools de conexões e de processos antes da medição
+    await funcao(cliente, random.Random(semente), estado)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador(i) for i in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "p50_ms": round(_percentil(latencias, 50), 3),
+        "p95_ms": round(_percentil(latencias, 95), 3),
+        "p99_ms": round(_percentil(latencias, 99), 3),
+        "vazao_rps": round(len(latencias) / duracao, 1) if duracao else None,
+    }
+
+async def _executar_cenario(livros: int, args, diretorio: str):
+    import httpx
+    from app import database
+    from app.config import carregar_configuracoes
+    from app.main import create_app
+    from app.schema import inicializar_banco
+    from app.services.cache_respostas import cache_respostas
+    from app.utils.auth import cache_usuarios, criar_acesso_token
+    from app.utils.hash_senha import criar_contexto, pool_hash
+    from benchmarks.semear import USUARIO_BENCHMARK, SENHA_BENCHMARK, semear_catalogo
+
+    caminho = os.path.join(diretorio, f"livros_{livros}.db")
+    sobrescritas = {"database_url": f"sqlite:///{caminho}", "log_nivel": "WARNING"}
+    if args.bcrypt_rounds is not None:
+        sobrescritas["bcrypt_rounds"] = args.bcrypt_rounds
+    if args.escrita_agrupada:
+        sobrescritas["escrita_agrupada"] = True
+    app = create_app(carregar_configuracoes(**sobrescritas))
+    inicializar_banco(database.engine)
+    cache_respostas.limpar()
+    cache_usuarios.limpar()
+
+    inicio = time.perf_counter()
+    semear_catalogo(
+        database.engine, livros, semente=args.semente,
+        senha_hash=criar_contexto(pool_hash.rounds).hash(SENHA_BENCHMARK),
+    )
+    tempo_semeadura = time.perf_counter() - inicio
+
+    estado = {
+        "livros": livros,
+        "criados": [],
+        "proximo_a_remover": list(range(1, livros + 1)),
+        "headers": {"Authorization": f"Bearer {criar_acesso_token(data={'sub': USUARIO_BENCHMARK})}"},
+    }
+    resultados = {
+        "semeadura_s": round(tempo_semeadura, 2),
+        "indice_sugestoes": _medir_indice_sugestoes(database.engine, args.requisicoes, args.semente),
+    }
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+        for operacao in args.operacoes:
+            resultados[operacao] = await _medir_operacao(
+                cliente, operacao, args.requisicoes, args.concorrencia, estado, args.semente
+            )
+    database.engine.dispose()
+    database.engine_leitura.dispose()
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--requisicoes", type=int, default=500, help="requisições por operação")
+    parser.add_argument("--operacoes", nargs="+", choices=OPERACOES, default=OPERACOES)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="custo do bcrypt usado no login")
+    parser.add_argument("--partidas", type=int, default=5, help="processos novos usados na medição de partida a frio")
+    parser.add_argument("--escrita-agrupada", action="store_true", help="liga o group commit das criações/atualizações")
+    parser.add_argument("--saida", help="arquivo JSON onde gravar o resultado (além da saída padrão)")
+    args = parser.parse_args(argv)
+
+    diretorio = tempfile.mkdtemp(prefix="benchmark_livros_")
+
+    relatorio = {
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "concorrencia": args.concorrencia,
+        "requisicoes_por_operacao": args.requisicoes,
+        "semente": args.semente,
+        "escrita_agrupada": args.escrita_agrupada,
+        "resultados": {},
+    }
+    # Os logs INFO por requisição poluiriam a saída e distorceriam as medições
+    logging.getLogger("app").setLevel(logging.WARNING)
+    try:
+        if args.partidas > 0:
+            relatorio["partida_a_frio"] = _medir_partida_a_frio(args.partidas, diretorio)
+        for livros in args.tamanhos:
+            relatorio["resultados"][str(livros)] = asyncio.run(_executar_cenario(livros, args, diretorio))
+    finally:
+        from app.services.escrita_agrupada import escritor_agrupado
+        from app.utils.hash_senha import pool_hash
+        escritor_agrupado.encerrar()
+        pool_hash.encerrar()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    print(saida)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+
+if __name__ == "__main__":
+    main()
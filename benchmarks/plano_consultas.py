@@ -0,0 +1,66 @@
+"""Confere no planner do SQLite que cada combinação de filtros facetados usa um índice.
+
+Para cada combinação de genero, ano, categoria_id e autor, roda EXPLAIN QUERY PLAN na consulta
+da página e nas contagens de facetas de GET /livros/facetas e falha se alguma varrer a tabela livros.
+
+Uso: python -m benchmarks.plano_consultas [--livros 20000]
+"""
+import argparse
+import itertools
+import shutil
+import sys
+import tempfile
+from sqlalchemy.dialects import sqlite
+
+# Valores usados só para montar as consultas; o plano não depende deles
+VALORES_EXEMPLO = {"genero": "Ficção", "ano": 1990, "categoria_id": 1, "autor": "Amor Silva"}
+
+def _plano(conn, consulta):
+    sql = str(consulta.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return [linha[3] for linha in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+# Retorna (combinação, consulta, plano) das consultas filtradas que não buscam por índice em livros
+def verificar_planos(conn):
+    from app.services.facetas_service import FILTROS_FACETADOS, condicoes_facetadas, consulta_pagina, consultas_facetas
+
+    falhas = []
+    for quantidade in range(1, len(FILTROS_FACETADOS) + 1):
+        for combinacao in itertools.combinations(FILTROS_FACETADOS, quantidade):
+            condicoes = condicoes_facetadas(**{campo: VALORES_EXEMPLO[campo] for campo in combinacao})
+            consultas = {"pagina": consulta_pagina(condicoes), **consultas_facetas(condicoes)}
+            for nome, consulta in consultas.items():
+                plano = _plano(conn, consulta)
+                acessos = [passo for passo in plano if " livros" in passo]
+                if not acessos or any(not passo.startswith("SEARCH livros USING") for passo in acessos):
+                    falhas.append((combinacao, nome, plano))
+    return falhas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--livros", type=int, default=20_000, help="tamanho do catálogo semeado")
+    args = parser.parse_args(argv)
+
+    from app import database
+    from app.config import Settings
+    from app.schema import inicializar_banco
+    from benchmarks.semear import semear_catalogo
+
+    diretorio = tempfile.mkdtemp(prefix="benchmark_planos_")
+    try:
+        database.configurar_banco(Settings(database_url=f"sqlite:///{diretorio}/planos.db"))
+        inicializar_banco(database.engine)
+        semear_catalogo(database.engine, args.livros)
+        with database.engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            falhas = verificar_planos(conn)
+        database.encerrar_banco()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    for combinacao, nome, plano in falhas:
+        print(f"{'+'.join(combinacao)} [{nome}]: {' | '.join(plano)}")
+    print(f"{len(falhas)} consulta(s) sem índice.")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
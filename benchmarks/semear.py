@@ -0,0 +1,43 @@
+"""Popula um banco descartável com um catálogo sintético e reprodutível."""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app.models.categoria import Categoria
+from app.models.livro import Livro
+from app.models.user import Usuario
+
+PALAVRAS = [
+    "amor", "guerra", "sombra", "cidade", "mar", "noite", "jardim", "segredo", "viagem", "memória",
+    "tempo", "casa", "rio", "sertão", "estrela", "caminho", "silêncio", "fogo", "vento", "ilha",
+]
+SOBRENOMES = ["Silva", "Souza", "Costa", "Pereira", "Almeida", "Rocha", "Lima", "Araújo", "Barros", "Moura"]
+GENEROS = ["Ficção", "Romance", "Fantasia", "Drama", "Poesia", "Ensaio", "Biografia", "Suspense"]
+
+USUARIO_BENCHMARK = "benchmark"
+SENHA_BENCHMARK = "benchmark"
+
+def _titulo(rng: random.Random) -> str:
+    return " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(2, 4))).capitalize()
+
+def semear_catalogo(engine, livros: int, categorias: int = 50, semente: int = 42, senha_hash: str = None, lote: int = 10000):
+    rng = random.Random(semente)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Categoria.__table__), [{"id": i, "nome": f"Categoria {i}"} for i in range(1, categorias + 1)])
+        if senha_hash:
+            conn.execute(insert(Usuario.__table__), [{"nome_usuario": USUARIO_BENCHMARK, "senha_hash": senha_hash}])
+        for inicio in range(1, livros + 1, lote):
+            linhas = []
+            for livro_id in range(inicio, min(inicio + lote, livros + 1)):
+                data = base + timedelta(seconds=livro_id)
+                linhas.append({
+                    "id": livro_id,
+                    "titulo": _titulo(rng),
+                    "autor": f"{rng.choice(PALAVRAS).capitalize()} {rng.choice(SOBRENOMES)}",
+                    "ano": rng.randint(1850, 2024),
+                    "genero": rng.choice(GENEROS),
+                    "categoria_id": rng.randint(1, categorias),
+                    "created_at": data,
+                    "updated_at": data,
+                })
+            conn.execute(insert(Livro.__table__), linhas)